@@ -0,0 +1,113 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.transcript_ingest import parse_transcript, render_segments  # noqa: E402
+from services.transcript_service import remove_timestamps_from_transcript  # noqa: E402
+
+WORDS = (
+    "thank you for calling how may i help you today my name is the order was shipped on monday "
+    "can you confirm your date of birth please sure it is march third we will process the refund "
+    "is there anything else i can help you with have a great day this call is on a recorded line"
+).split()
+
+
+def _stamp(seconds: float, sep: str = ",") -> str:
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{int(secs):02d}{sep}{int((secs % 1) * 1000):03d}"
+
+
+def _clock(seconds: float) -> str:
+    hours, rest = divmod(int(seconds), 3600)
+    return f"{hours}:{rest // 60:02d}:{rest % 60:02d}"
+
+
+def synthetic_segments(target_bytes: int, seed: int = 0) -> List[Dict]:
+    rng = random.Random(seed)
+    segments, size, start = [], 0, 0.0
+    while size < target_bytes:
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 20))) + "."
+        segments.append({"start": round(start, 2), "end": round(start + 0.4, 2), "text": text})
+        size += len(text) + 16
+        start += rng.uniform(0.1, 0.4)  # dense timeline keeps 16 MB inputs under 24 hours
+    return segments
+
+
+def render_format(segments: List[Dict], fmt: str) -> str:
+    if fmt == "json":
+        return json.dumps(segments)
+    if fmt == "srt":
+        return "\n".join(
+            f"{i + 1}\n{_stamp(s['start'])} --> {_stamp(s['end'])}\n{s['text']}\n" for i, s in enumerate(segments)
+        )
+    if fmt == "vtt":
+        return "WEBVTT\n\n" + "\n".join(
+            f"{_stamp(s['start'], '.')} --> {_stamp(s['end'], '.')}\n{s['text']}\n" for s in segments
+        )
+    if fmt == "lines":
+        return "\n".join(f"{_stamp(s['start'])[:8]} {s['text']}" for s in segments)
+    if fmt == "glued":  # as pasted from a player UI: "0:00:05Text0:00:09Text"
+        return "".join(f"{_clock(s['start'])}{s['text']}" for s in segments)
+    raise ValueError(fmt)
+
+
+def best_of(fn: Callable, arg, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn(arg)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main(argv: Optional[List[str]] = None) -> Dict:
+    parser = argparse.ArgumentParser(description="Benchmark supplied-transcript ingestion on large inputs.")
+    parser.add_argument("--sizes-mb", default="1,4,16", help="Comma-separated input sizes in MB")
+    parser.add_argument("--formats", default="lines,glued,srt,vtt,json")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    results = []
+    for size_mb in [float(s) for s in args.sizes_mb.split(",") if s]:
+        segments = synthetic_segments(int(size_mb * 1024 * 1024))
+        for fmt in [f for f in args.formats.split(",") if f]:
+            text = render_format(segments, fmt)
+            mb = len(text.encode()) / 1048576
+            parsed = parse_transcript(text)
+            seconds = best_of(parse_transcript, text, args.repeats)
+            row = {
+                "format": fmt,
+                "inputMB": round(mb, 2),
+                "segments": len(parsed),
+                "expectedSegments": len(segments),
+                "parseSeconds": round(seconds, 4),
+                "parseMBPerSecond": round(mb / seconds, 1) if seconds else None,
+                "promptMB": round(len(render_segments(parsed).encode()) / 1048576, 2),
+            }
+            if fmt in ("lines", "glued"):
+                baseline = best_of(remove_timestamps_from_transcript, text, args.repeats)
+                row["legacyStripSeconds"] = round(baseline, 4)
+            results.append(row)
+            print(
+                f"{fmt:>6} {row['inputMB']:>7.2f} MB  {row['segments']:>7} segments  "
+                f"{row['parseSeconds']:.3f}s ({row['parseMBPerSecond']} MB/s)"
+                + (f"  legacy strip {row['legacyStripSeconds']:.3f}s" if "legacyStripSeconds" in row else "")
+            )
+
+    report = {"results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RULE_ID_PATTERN = re.compile(r"\[ID: ([^\]]+)\]")
+
+
+class StubConfig:
+    def __init__(self, latency: float = 0.5, jitter: float = 0.2, rate_limit_ratio: float = 0.0, retry_after: int = 1, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.rate_limited = 0
+
+    def draw(self):
+        with self.lock:
+            self.calls += 1
+            limited = self.random.random() < self.rate_limit_ratio
+            if limited:
+                self.rate_limited += 1
+            delay = max(0.0, self.random.gauss(self.latency, self.jitter))
+            return limited, delay
+
+
+def fake_verdicts(prompt: str, config: StubConfig) -> list:
+    """
+    Answers every "[ID: x]" rule in the prompt with a plausible verdict, in the format
+    build_gpt_prompt_with_confidence asks for. Verdicts are drawn from the seeded config.random.
+    """
+    verdicts = []
+    with config.lock:
+        for rule_id in RULE_ID_PATTERN.findall(prompt):
+            verdicts.append({
+                "ruleId": rule_id,
+                "rule": "",
+                "result": config.random.choice(["Yes", "No", "Unknown"]),
+                "reason": "Synthetic verdict from the benchmark stub.",
+                "confidenceScore": round(config.random.uniform(0.5, 1.0), 2),
+            })
+    return verdicts
+
+
+def make_handler(config: StubConfig):
+    class ChatCompletionsHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body: dict, headers: dict = None):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send(404, {"error": {"message": "not found"}})
+                return
+
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            limited, delay = config.draw()
+
+            if limited:
+                self._send(429, {"error": {"message": "Rate limit reached (stub)", "type": "requests"}},
+                           {"Retry-After": str(config.retry_after)})
+                return
+
+            time.sleep(delay)
+            prompt = "\n".join(m.get("content", "") for m in body.get("messages", []))
+            content = json.dumps(fake_verdicts(prompt, config))
+            prompt_tokens = len(prompt) // 4
+            completion_tokens = len(content) // 4
+
+            self._send(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            })
+
+    return ChatCompletionsHandler
+
+
+def start_stub(host: str = "127.0.0.1", port: int = 0, config: StubConfig = None):
+    """
+    Starts the stub on a background thread. Point the API at it with OPENAI_BASE_URL=http://host:port/v1.
+    Returns (server, config).
+    """
+    config = config or StubConfig()
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, config
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI chat-completions API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.5, help="Mean response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Latency standard deviation in seconds")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="Fraction of calls answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+
+    server, _ = start_stub(args.host, args.port, StubConfig(args.latency, args.jitter, args.rate_limit_ratio, args.retry_after))
+    print(f"OpenAI stub listening on http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
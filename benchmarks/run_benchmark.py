@@ -0,0 +1,316 @@
+import argparse
+import functools
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.openai_stub import StubConfig, start_stub  # noqa: E402
+from benchmarks.synthetic_audio import generate_audio_file  # noqa: E402
+
+METRIC_LINE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})? (\S+)$")
+STAGE_LABEL = re.compile(r'stage="([^"]+)"')
+
+SAMPLE_RULES = [
+    "Agent greeted the customer with thank you for calling",
+    "Agent mentioned the call is on a recorded line",
+    "Agent asked for the customer's name",
+    "Agent verified the customer's date of birth",
+    "Agent offered further assistance before closing",
+    "Customer issue was resolved on the call",
+    "Agent did not interrupt the customer",
+    "Agent confirmed the mailing address",
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def scrape_metrics(api_base: str) -> Dict[str, float]:
+    """Returns {"name{labels}": value} from the server's /metrics endpoint, or {} if unavailable."""
+    try:
+        text = requests.get(f"{api_base}/metrics", timeout=5).text
+    except Exception:
+        return {}
+    samples = {}
+    for line in text.splitlines():
+        match = METRIC_LINE.match(line)
+        if match:
+            samples[match.group(1) + (match.group(2) or "")] = float(match.group(3))
+    return samples
+
+
+def stage_report(before: Dict[str, float], after: Dict[str, float]) -> Dict[str, Dict]:
+    stages: Dict[str, Dict] = {}
+    for key, value in after.items():
+        label = STAGE_LABEL.search(key)
+        if not label:
+            continue
+        stage = stages.setdefault(label.group(1), {})
+        delta = value - before.get(key, 0.0)
+        if key.startswith("audit_stage_seconds_sum"):
+            stage["wallSeconds"] = round(delta, 3)
+        elif key.startswith("audit_stage_seconds_count"):
+            stage["count"] = int(delta)
+        elif key.startswith("audit_stage_cpu_seconds_total"):
+            stage["cpuSeconds"] = round(delta, 3)
+        elif key.startswith("audit_stage_rss_bytes"):
+            stage["rssBytes"] = int(value)
+
+    llm_sum = sum(v - before.get(k, 0.0) for k, v in after.items() if k.startswith("audit_llm_seconds_sum"))
+    llm_count = sum(v - before.get(k, 0.0) for k, v in after.items() if k.startswith("audit_llm_seconds_count"))
+    tokens = sum(v - before.get(k, 0.0) for k, v in after.items() if k.startswith("audit_llm_tokens_total"))
+    if llm_count:
+        stages["llm"] = {"wallSeconds": round(llm_sum, 3), "count": int(llm_count), "tokens": int(tokens)}
+    return stages
+
+
+class RssSampler(threading.Thread):
+    """Polls the server's RSS gauge to capture the peak during the run."""
+
+    def __init__(self, api_base: str, interval: float = 0.5):
+        super().__init__(daemon=True)
+        self.api_base = api_base
+        self.interval = interval
+        self.peak = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            rss = scrape_metrics(self.api_base).get("process_resident_memory_bytes", 0)
+            self.peak = max(self.peak, int(rss))
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def start_file_server(directory: str):
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=directory)
+    handler.log_message = lambda *args: None
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def spawn_api_server(port: int, stub_url: str, workdir: str) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_BASE_URL": stub_url,
+        "api_key": env.get("api_key", "sk-benchmark-stub"),
+        "JOB_STORE_PATH": os.path.join(workdir, "jobs.sqlite3"),
+    })
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=repo_root, env=env
+    )
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            requests.get(f"http://127.0.0.1:{port}/metrics", timeout=1)
+            return process
+        except Exception:
+            if process.poll() is not None:
+                raise RuntimeError("API server exited during startup")
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("API server did not start within 120s")
+
+
+def build_parameters(params: int, rules_per_param: int) -> List[Dict]:
+    parameters = []
+    for p in range(params):
+        rules = [
+            {"ruleId": f"{p}-{r}", "rule": SAMPLE_RULES[(p * rules_per_param + r) % len(SAMPLE_RULES)]}
+            for r in range(rules_per_param)
+        ]
+        parameters.append({"id": p, "name": f"Parameter {p}", "ruleList": rules})
+    return parameters
+
+
+def synthetic_transcript(seconds: float) -> str:
+    lines = []
+    for i in range(int(seconds // 5)):
+        minutes, secs = divmod(i * 5, 60)
+        lines.append(f"{minutes}:{secs:02d} {SAMPLE_RULES[i % len(SAMPLE_RULES)].lower()}.")
+    return "\n".join(lines)
+
+
+def run_load(url: str, bodies: List[Dict], concurrency: int, timeout: float) -> Dict:
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    lock = threading.Lock()
+
+    def send(body: Dict):
+        started = time.perf_counter()
+        try:
+            status = str(requests.post(url, json=body, timeout=timeout).status_code)
+        except Exception as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - started
+        with lock:
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == "200":
+                latencies.append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(send, bodies))
+    wall = time.perf_counter() - started
+
+    return {
+        "requests": len(bodies),
+        "statuses": statuses,
+        "wallSeconds": round(wall, 3),
+        "auditsPerMinute": round(len(latencies) / wall * 60, 2) if wall else 0.0,
+        "latency": {
+            "mean": round(sum(latencies) / len(latencies), 4) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50), 4),
+            "p95": round(percentile(latencies, 95), 4),
+            "p99": round(percentile(latencies, 99), 4),
+            "max": round(max(latencies), 4) if latencies else 0.0,
+        },
+    }
+
+
+def compare(current: Dict, baseline_path: str) -> None:
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nComparison against {baseline_path}:")
+    for name, result in current["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(name)
+        if not base:
+            continue
+        for metric in ("p50", "p95", "p99"):
+            old, new = base["latency"][metric], result["latency"][metric]
+            change = (new - old) / old * 100 if old else 0.0
+            print(f"  {name} {metric}: {old:.3f}s -> {new:.3f}s ({change:+.1f}%)")
+        old, new = base["auditsPerMinute"], result["auditsPerMinute"]
+        change = (new - old) / old * 100 if old else 0.0
+        print(f"  {name} audits/min: {old} -> {new} ({change:+.1f}%)")
+
+
+def main(argv: Optional[List[str]] = None) -> Dict:
+    parser = argparse.ArgumentParser(description="End-to-end throughput/latency benchmark for the audit API.")
+    parser.add_argument("--api-url", default="http://127.0.0.1:9001", help="Base URL of a running API (ignored with --spawn-server)")
+    parser.add_argument("--spawn-server", action="store_true", help="Start uvicorn wired to the local OpenAI stub")
+    parser.add_argument("--server-port", type=int, default=9099)
+    parser.add_argument("--endpoints", default="analyze-audio-testing,analyze-single-rule")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--audio-seconds", type=float, default=120)
+    parser.add_argument("--audio-format", default="mp3", choices=["wav", "mp3", "m4a", "ogg", "flac"])
+    parser.add_argument("--sample-rate", type=int, default=8000)
+    parser.add_argument("--seed-audio", help="Loop a real recording instead of synthesizing")
+    parser.add_argument("--with-transcript", action="store_true", help="Send a transcript instead of audio")
+    parser.add_argument("--params", type=int, default=3)
+    parser.add_argument("--rules-per-param", type=int, default=4)
+    parser.add_argument("--stub-latency", type=float, default=0.5)
+    parser.add_argument("--stub-jitter", type=float, default=0.2)
+    parser.add_argument("--stub-429-ratio", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="audit-bench-")
+    stub, stub_config = start_stub(config=StubConfig(args.stub_latency, args.stub_jitter, args.stub_429_ratio))
+    stub_url = f"http://127.0.0.1:{stub.server_address[1]}/v1"
+
+    server_process = None
+    api_base = args.api_url.rstrip("/")
+    if args.spawn_server:
+        server_process = spawn_api_server(args.server_port, stub_url, workdir)
+        api_base = f"http://127.0.0.1:{args.server_port}"
+
+    files = None
+    try:
+        audio_name = f"call.{args.audio_format}"
+        generate_audio_file(os.path.join(workdir, audio_name), args.audio_seconds, args.sample_rate, seed_audio=args.seed_audio)
+        files = start_file_server(workdir)
+        audio_url = f"http://127.0.0.1:{files.server_address[1]}/{audio_name}"
+        transcript = synthetic_transcript(args.audio_seconds)
+        parameters = build_parameters(args.params, args.rules_per_param)
+
+        results = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "host": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+            "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+            "endpoints": {},
+        }
+
+        for endpoint in [e.strip() for e in args.endpoints.split(",") if e.strip()]:
+            if endpoint == "analyze-single-rule":
+                bodies = [
+                    {"ruleId": i, "rule": SAMPLE_RULES[i % len(SAMPLE_RULES)], "transcript": transcript}
+                    for i in range(args.requests)
+                ]
+            else:
+                # Unique ids so the job store never answers from a previous run
+                bodies = [{
+                    "audioUrl": audio_url,
+                    "transcription": transcript if args.with_transcript else None,
+                    "sampleId": f"bench-{uuid.uuid4()}",
+                    "audioFileId": f"bench-{uuid.uuid4()}",
+                    "parameter": parameters,
+                } for _ in range(args.requests)]
+
+            before = scrape_metrics(api_base)
+            sampler = RssSampler(api_base)
+            sampler.start()
+            load = run_load(f"{api_base}/api/v1/{endpoint}", bodies, args.concurrency, args.timeout)
+            sampler.stop()
+            after = scrape_metrics(api_base)
+
+            load["stages"] = stage_report(before, after)
+            load["process"] = {
+                "cpuSeconds": round(after.get("process_cpu_seconds_total", 0) - before.get("process_cpu_seconds_total", 0), 3),
+                "childCpuSeconds": round(after.get("process_children_cpu_seconds_total", 0) - before.get("process_children_cpu_seconds_total", 0), 3),
+                "rssStartBytes": int(before.get("process_resident_memory_bytes", 0)),
+                "rssPeakBytes": sampler.peak,
+                "rssEndBytes": int(after.get("process_resident_memory_bytes", 0)),
+            }
+            results["endpoints"][endpoint] = load
+            print(f"{endpoint}: {json.dumps(load['latency'])} audits/min={load['auditsPerMinute']} statuses={load['statuses']}")
+
+        results["stub"] = {"calls": stub_config.calls, "rateLimited": stub_config.rate_limited}
+
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+        if args.compare:
+            compare(results, args.compare)
+        return results
+
+    finally:
+        if files:
+            files.shutdown()
+        stub.shutdown()
+        if server_process:
+            server_process.terminate()
+            server_process.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import argparse
+import os
+import subprocess
+import tempfile
+import wave
+
+import numpy as np
+
+# Container/codec per output extension; wav is written directly, everything else goes through ffmpeg.
+FFMPEG_CODECS = {
+    ".mp3": ["-acodec", "libmp3lame", "-b:a", "64k"],
+    ".m4a": ["-acodec", "aac", "-b:a", "64k"],
+    ".ogg": ["-acodec", "libvorbis", "-q:a", "3"],
+    ".flac": ["-acodec", "flac"],
+    ".wav": ["-acodec", "pcm_s16le"],
+}
+
+
+def synthesize_call(seconds: float, sample_rate: int = 16000, seed: int = 0) -> np.ndarray:
+    """
+    Generates speech-like audio: voiced "syllables" (harmonic tones with a pitch glide and
+    envelope) grouped into words and turns, separated by pauses, over light line noise.
+    Returns int16 mono samples.
+    """
+    rng = np.random.default_rng(seed)
+    total = int(seconds * sample_rate)
+    out = np.zeros(total, dtype=np.float32)
+
+    pos = 0
+    speaker_f0 = [rng.uniform(95, 140), rng.uniform(170, 240)]  # two alternating "speakers"
+    turn = 0
+    while pos < total:
+        f0_base = speaker_f0[turn % 2]
+        turn_end = pos + int(rng.uniform(2.0, 8.0) * sample_rate)
+        while pos < min(turn_end, total):
+            syllable = int(rng.uniform(0.08, 0.25) * sample_rate)
+            n = min(syllable, total - pos)
+            t = np.arange(n) / sample_rate
+            f0 = f0_base * (1 + 0.08 * np.sin(2 * np.pi * rng.uniform(1, 4) * t))
+            phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+            tone = sum(np.sin(k * phase) / k for k in range(1, 6))
+            envelope = np.sin(np.pi * np.arange(n) / max(n, 1)) ** 2
+            out[pos:pos + n] += (0.25 * tone * envelope).astype(np.float32)
+            pos += n + int(rng.uniform(0.02, 0.3) * sample_rate)
+        pos += int(rng.uniform(0.3, 1.2) * sample_rate)
+        turn += 1
+
+    out += rng.normal(0, 0.01, total).astype(np.float32)
+    return (np.clip(out, -1.0, 1.0) * 32767).astype(np.int16)
+
+
+def write_wav(path: str, samples: np.ndarray, sample_rate: int) -> None:
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.tobytes())
+
+
+def generate_audio_file(
+    output_path: str,
+    seconds: float,
+    sample_rate: int = 16000,
+    seed: int = 0,
+    seed_audio: str = None,
+) -> str:
+    """
+    Writes a synthetic call of the given length. The format follows the output extension.
+    With seed_audio, a real recording is looped to the requested length instead, which gives
+    Whisper realistic speech to decode.
+    """
+    ext = os.path.splitext(output_path)[-1].lower()
+    if ext not in FFMPEG_CODECS:
+        raise ValueError(f"Unsupported output format: {ext}")
+
+    if seed_audio:
+        command = [
+            "ffmpeg", "-y", "-v", "error", "-stream_loop", "-1", "-i", seed_audio,
+            "-t", str(seconds), "-ar", str(sample_rate), "-ac", "1", *FFMPEG_CODECS[ext], output_path
+        ]
+        subprocess.run(command, check=True)
+        return output_path
+
+    samples = synthesize_call(seconds, sample_rate, seed)
+    if ext == ".wav":
+        write_wav(output_path, samples, sample_rate)
+        return output_path
+
+    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
+        wav_path = tmp.name
+    try:
+        write_wav(wav_path, samples, sample_rate)
+        subprocess.run(["ffmpeg", "-y", "-v", "error", "-i", wav_path, *FFMPEG_CODECS[ext], output_path], check=True)
+    finally:
+        os.remove(wav_path)
+    return output_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic call audio for benchmarks.")
+    parser.add_argument("output", help="Output path; extension picks the format (.wav, .mp3, .m4a, .ogg, .flac)")
+    parser.add_argument("--seconds", type=float, default=300)
+    parser.add_argument("--sample-rate", type=int, default=16000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--seed-audio", help="Loop this real recording instead of synthesizing")
+    args = parser.parse_args()
+    print(generate_audio_file(args.output, args.seconds, args.sample_rate, args.seed, args.seed_audio))
@@ -1,11 +1,23 @@
-from typing import List, Union, Optional
+from typing import List, Literal, Union, Optional
 from pydantic import BaseModel
 
+class RuleMatcher(BaseModel):
+    type: str = "phrase"  # "phrase" | "regex" | "proximity"
+    patterns: List[str]  # phrase/proximity: all must occur; regex: any may match
+    withinSeconds: Optional[float] = None  # proximity: max distance between the patterns
+    startSeconds: Optional[float] = None  # only look at segments starting in [start, end); negative counts from the end
+    endSeconds: Optional[float] = None
+    expect: str = "present"  # "present" | "absent"
+
 class RuleItem(BaseModel):
     ruleId: Optional[Union[int, str]] = None
     rule: str
+    matcher: Optional[RuleMatcher] = None  # resolved locally instead of by the LLM
 
 RuleListType = Union[List[str], List[RuleItem]]
+# Keys of services.transcription_profiles.TRANSCRIPTION_PROFILES; anything else is a 422
+TranscriptionProfileName = Literal["fast", "balanced", "accurate"]
+
 class ParameterRule(BaseModel):
     id: Optional[Union[int, str]] = None
     name: Optional[str] = None
@@ -18,6 +30,10 @@ class AuditRequest(BaseModel):
     audioFileId: Optional[str] = None
     userUuid: Optional[str] = None
     parameter: List[ParameterRule]
+    transcriptionProfile: Optional[TranscriptionProfileName] = None
+    language: Optional[str] = None  # Whisper language code, or "auto" to detect on the first window
+    transcriptExcerpts: Optional[bool] = None  # send each rule group only the relevant excerpt (default TRANSCRIPT_EXCERPTS)
+    speculative: Optional[bool] = None  # evaluate a draft transcript while transcribing (default SPECULATIVE_EVALUATION)
 
 
 class SingleRuleRequest(BaseModel):
@@ -31,3 +47,21 @@ class SingleRuleResponse(BaseModel):
     result: str
     reason: str
     confidenceScore: float = 0.0
+
+class RulesRequest(BaseModel):
+    transcript: str
+    rules: List[RuleItem]
+
+
+class BatchAuditRequest(BaseModel):
+    items: List[AuditRequest]
+
+
+class LiveAuditStart(BaseModel):
+    """First (text) message on the /live-audit WebSocket; binary audio frames follow."""
+    parameter: List[ParameterRule]
+    encoding: str = "pcm_s16le"  # "pcm_s16le" | "mulaw", mono
+    sampleRate: int = 16000
+    sessionId: Optional[str] = None
+    transcriptionProfile: Optional[TranscriptionProfileName] = None
+    language: Optional[str] = None
@@ -1,7 +1,42 @@
+import os
+import time
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from routes.extract import router as extract_router
+from routes.batch import router as batch_router
+from routes.live import router as live_router
+from routes.metrics import router as metrics_router
+from routes.profiles import router as profiles_router
+from services.audit_pipeline import KIND_AUDIT, KIND_BATCH, recover_unfinished_jobs
+from services.metrics_service import REQUEST_SECONDS
 
 load_dotenv()
 app = FastAPI(title="Audio-Auditing Intelligence API")
-app.include_router(extract_router, prefix="/api/v1")
\ No newline at end of file
+app.include_router(extract_router, prefix="/api/v1")
+app.include_router(batch_router, prefix="/api/v1")
+app.include_router(live_router, prefix="/api/v1")
+app.include_router(profiles_router, prefix="/api/v1")
+app.include_router(metrics_router)
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        # Label by route template, not raw path, to keep cardinality bounded
+        route = request.scope.get("route")
+        endpoint = getattr(route, "path", "unmatched")
+        if endpoint != "/metrics":
+            REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint, status=status)
+
+
+@app.on_event("startup")
+async def requeue_unfinished_jobs():
+    # Jobs interrupted by a crash or restart are resumed from their last completed stage.
+    webhook_url = os.getenv("WEBHOOK_URL")
+    recover_unfinished_jobs({KIND_AUDIT: webhook_url, KIND_BATCH: webhook_url})
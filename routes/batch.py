@@ -0,0 +1,25 @@
+import os
+from fastapi import APIRouter, HTTPException
+from dtos.audit_models import BatchAuditRequest
+from services.batch_pipeline import get_batch, submit_batch
+
+router = APIRouter()
+webhook_url = os.getenv("WEBHOOK_URL")
+
+
+@router.post("/analyze-audio-batch", status_code=202)
+async def analyze_audio_batch(request: BatchAuditRequest):
+    if not request.items:
+        raise HTTPException(status_code=400, detail="Batch contains no items.")
+
+    # Each completed item is posted to the webhook like /analyze-audio, when one is configured.
+    job = submit_batch(request.items, webhook_url)
+    return {"batchId": job.batch_id, "total": len(job.items)}
+
+
+@router.get("/analyze-audio-batch/{batch_id}")
+async def get_batch_progress(batch_id: str, includeResults: bool = False):
+    job = get_batch(batch_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch not found.")
+    return job.progress(include_results=includeResults)
@@ -1,168 +1,160 @@
-import asyncio
-import gc
-import os, tempfile, shutil
+import os
 import traceback
+import uuid
+from typing import List, Optional
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
-import requests
-from dtos.audit_models import AuditRequest, RuleItem, SingleRuleRequest, SingleRuleResponse
-from fastapi import APIRouter, HTTPException
-from services.transcript_service import format_transcript_without_speaker, remove_timestamps_from_transcript
-from services.whisper_service import transcribe_audio_whisper
-from services.openai_service import evaluate_param_with_rules, evaluate_rules_with_gpt_using_requests, evaluate_rules_with_gpt_using_requests_with_confidence, evaluate_rules_with_gpt_using_sdk_with_confidence
-from services.audio_format_handler import transcode_to_whisper_wav
+from dtos.audit_models import AuditRequest, RuleItem, RulesRequest, SingleRuleRequest, SingleRuleResponse
+from fastapi import APIRouter, Header, HTTPException, Request, Response
+from services.openai_service import evaluate_rules_packed_async, evaluate_rules_with_gpt_using_requests, evaluate_rules_with_gpt_using_requests_with_confidence, evaluate_rules_with_gpt_using_sdk_with_confidence_async
+from services.admission_service import AdmissionRejected, admission_controller
+from services.cancellation import DEADLINE_EXCEEDED, AuditCancelled, resolve_timeout, run_guarded
+from services.audit_pipeline import KIND_AUDIT, KIND_TESTING, deliver_webhook, run_audit, run_in_thread
+from services.job_store import derive_job_id
+from services.preflight_service import AudioRejected
+from services.profiling_service import profile_request
+from services.rule_engine import split_local_rules
+from services.transcript_ingest import TranscriptRejected
 
 router = APIRouter()
 webhook_url = os.getenv("WEBHOOK_URL")
 
+
+def rejected_response(e: AdmissionRejected, detail) -> HTTPException:
+    return HTTPException(status_code=429, detail=detail, headers={"Retry-After": str(e.retry_after)})
+
+
+def cancelled_response(e: AuditCancelled, detail: dict) -> HTTPException:
+    # 499 (client closed request) is only ever seen in logs; the client is gone
+    status_code = 504 if e.reason == DEADLINE_EXCEEDED else 499
+    return HTTPException(status_code=status_code, detail={**detail, "status": "cancelled", "errorCode": e.reason, "error": str(e)})
+
 @router.post("/analyze-audio")
-async def audit_call(request: AuditRequest):
+async def audit_call(
+    request: AuditRequest,
+    http_request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None),
+    x_audit_profile: Optional[str] = Header(None),
+    x_audit_timeout: Optional[str] = Header(None),
+):
     # print(f"Received request: {request}")
-    audio_path = None
-    transcoded_path = None
-
     if not webhook_url:
         raise HTTPException(status_code=500, detail="Webhook URL not configured.")
 
-    try:
-        # Step 1: Download the audio
-        response = requests.get(request.audioUrl, stream=True)
-        if response.status_code != 200:
-            raise HTTPException(status_code=400, detail="Failed to download audio")
+    job_id = derive_job_id(KIND_AUDIT, request, idempotency_key)
 
-        # Step 2: Save audio to temp file
-        ext = os.path.splitext(request.audioUrl)[-1]
-        with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp:
-            shutil.copyfileobj(response.raw, tmp)
-            audio_path = tmp.name
+    try:
+        # Steps 1-5: download, transcode, transcribe and evaluate (resumed from the job store on retry)
+        async with profile_request(job_id, x_audit_profile) as profile:
+            payload = await run_guarded(
+                job_id, lambda: run_audit(job_id, KIND_AUDIT, request), http_request, resolve_timeout(x_audit_timeout)
+            )
+        if profile:
+            response.headers["X-Profile-Id"] = job_id
 
-        # Step 3: Transcode if needed
-        transcoded_path = transcode_to_whisper_wav(audio_path)
+        # Step 6: Send success webhook
+        await deliver_webhook(job_id, webhook_url, payload)
 
-        # Step 4: Transcribe
-        transcript = transcribe_audio_whisper(transcoded_path)
+        # return {"message": "Audit completed and webhook sent", "payload": payload}
+        return {"message": "Audit completed and webhook sent", "jobId": job_id}
 
-        # Step 5: Evaluate parameters
-        evaluations = await asyncio.gather(*[
-            evaluate_param_with_rules(transcript, param)
-            for param in request.parameter
-        ])
+    except AdmissionRejected as e:
+        raise rejected_response(e, {"sampleId": request.sampleId, "status": "rejected", "error": str(e)})
 
-        # formatted_transcript = format_transcript_with_speakers(transcript)
-        formatted_transcript = format_transcript_without_speaker(transcript)
+    except AuditCancelled as e:
+        raise cancelled_response(e, {"sampleId": request.sampleId, "jobId": job_id})
 
-        # Step 6: Send success webhook
-        payload = {
+    except AudioRejected as e:
+        raise HTTPException(status_code=422, detail={
             "sampleId": request.sampleId,
-            "status": "completed",
-            "transcript": formatted_transcript,
-            "evaluations": evaluations
-        }
-
-        try:
-            response = requests.post(webhook_url, json=payload)
-            print(f"[Webhook Success] Status: {response.status_code}, Response: {response.text}")
-            # print(f"[Webhook Success] Status: {response.status_code}, Response: {response.text}, payload: {payload}")
-        except Exception as e:
-            print(f"[Webhook Error on success] {str(e)}")
-
-        # return {"message": "Audit completed and webhook sent", "payload": payload}
-        return {"message": "Audit completed and webhook sent"}
+            "jobId": job_id,
+            "status": "error",
+            "errorCode": e.code,
+            "error": str(e)
+        })
 
     except Exception as e:
         # Step 7: Send failure webhook
         error_payload = {
             "sampleId": request.sampleId,
+            "jobId": job_id,
             "status": "error",
             "error": str(e)
         }
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=error_payload)
 
-    finally:
-        for path in [audio_path, transcoded_path]:
-            try:
-                if path and os.path.exists(path):
-                    os.remove(path)
-            except Exception as e:
-                print(f"Failed to remove temp file {path}: {e}")
-
 
 testing_webhook_url = os.getenv("TESTING_WEBHOOK_URL")
 
 @router.post("/analyze-audio-testing")
-async def audit_call(request: AuditRequest):
+async def audit_call(
+    request: AuditRequest,
+    http_request: Request,
+    idempotency_key: Optional[str] = Header(None),
+    x_audit_profile: Optional[str] = Header(None),
+    x_audit_timeout: Optional[str] = Header(None),
+):
     # print(f"Received request: {request}")
-    audio_path = None
-    transcoded_path = None
 
     # if not testing_webhook_url:
     #     raise HTTPException(status_code=500, detail="Webhook URL not configured.")
 
+    job_id = derive_job_id(KIND_TESTING, request, idempotency_key)
+
     try:
-        transcript = request.transcription
-        if not transcript or not transcript.strip():
-            # Step 1: Download the audio
-            response = requests.get(request.audioUrl, stream=True)
-            if response.status_code != 200:
-                raise HTTPException(status_code=400, detail="Failed to download audio")
-
-            # Step 2: Save audio to temp file
-            ext = os.path.splitext(request.audioUrl)[-1]
-            with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp:
-                shutil.copyfileobj(response.raw, tmp)
-                audio_path = tmp.name
-
-            # Step 3: Transcode if needed
-            transcoded_path = transcode_to_whisper_wav(audio_path)
-
-            # Step 4: Transcribe
-            transcript = transcribe_audio_whisper(transcoded_path)
-        else:
-            transcript = remove_timestamps_from_transcript(transcript)
-
-        # Step 2: Evaluate all parameters in parallel using OpenAI GPT
-        evaluations = await asyncio.gather(*[
-            evaluate_param_with_rules(transcript, param)
-            for param in request.parameter
-        ])
-        
-        # Step 6: Send success webhook
-        payload = {
+        # Evaluate all parameters in parallel using OpenAI GPT (resumed from the job store on retry)
+        async with profile_request(job_id, x_audit_profile) as profile:
+            payload = await run_guarded(
+                job_id, lambda: run_audit(job_id, KIND_TESTING, request), http_request, resolve_timeout(x_audit_timeout)
+            )
+
+        # print(f"Payload: {payload}")
+        headers = {"X-Profile-Id": job_id} if profile else None
+        return JSONResponse(content=jsonable_encoder(payload), headers=headers)
+
+    except AdmissionRejected as e:
+        raise rejected_response(e, {
             "audioFileId": request.audioFileId,
             "userUuid": request.userUuid,
-            "status": "completed",
-            "transcript": format_transcript_without_speaker(transcript) if not request.transcription else None,
-            "evaluations": evaluations
-        }
+            "status": "rejected",
+        })
 
-        # print(f"Payload: {payload}")
-        gc.collect()
-        return JSONResponse(content=jsonable_encoder(payload))
+    except AuditCancelled as e:
+        raise cancelled_response(e, {"audioFileId": request.audioFileId, "userUuid": request.userUuid, "jobId": job_id})
+
+    except (AudioRejected, TranscriptRejected) as e:
+        raise HTTPException(status_code=422, detail={
+            "audioFileId": request.audioFileId,
+            "userUuid": request.userUuid,
+            "jobId": job_id,
+            "status": "error",
+            "errorCode": e.code,
+            "error": str(e)
+        })
 
     except Exception as e:
         # Step 7: Send failure webhook
         error_payload = {
             "audioFileId": request.audioFileId,
             "userUuid": request.userUuid,
+            "jobId": job_id,
             "status": "error",
             # "error": str(e)
         }
         traceback.print_exc() 
         raise HTTPException(status_code=500, detail=error_payload)
 
-    finally:
-        for path in [audio_path, transcoded_path]:
-            try:
-                if path and os.path.exists(path):
-                    os.remove(path)
-            except Exception as e:
-                traceback.print_exc() 
-                print(f"Failed to remove temp file {path}: {e}")
-
 
 @router.post("/analyze-single-rule", response_model=SingleRuleResponse)
-async def analyze_single_rule(request: SingleRuleRequest):
+async def analyze_single_rule(
+    request: SingleRuleRequest,
+    response: Response,
+    x_audit_profile: Optional[str] = Header(None),
+):
+    # Single-rule calls have no job; the profile (if any) is stored under this id
+    profile_id = f"single-rule:{uuid.uuid4()}"
     try:
         # print(f"Received request: {request}")
         rule_list = [{
@@ -170,9 +162,13 @@ async def analyze_single_rule(request: SingleRuleRequest):
             "rule": request.rule.replace("\n", " ")
         }]
 
-        result_list = evaluate_rules_with_gpt_using_sdk_with_confidence(
-            request.transcript, rule_list
-        )
+        ticket = admission_controller.estimate(0.0, 1, transcript_chars=len(request.transcript))
+        async with admission_controller.admit(ticket), profile_request(profile_id, x_audit_profile) as profile:
+            result_list = await evaluate_rules_with_gpt_using_sdk_with_confidence_async(
+                request.transcript, rule_list
+            )
+        if profile:
+            response.headers["X-Profile-Id"] = profile_id
 
         if not result_list or not isinstance(result_list, list):
             raise ValueError("Invalid AI response")
@@ -180,7 +176,6 @@ async def analyze_single_rule(request: SingleRuleRequest):
         result = result_list[0]  # Only one rule was sent
 
         # print(f"Result: {result}")
-        gc.collect()
         return SingleRuleResponse(
             ruleId=request.ruleId,
             rule=request.rule,
@@ -189,5 +184,60 @@ async def analyze_single_rule(request: SingleRuleRequest):
             confidenceScore=result.get("confidenceScore", 0.0)
         )
 
+    except AdmissionRejected as e:
+        raise rejected_response(e, f"Error processing rule: {str(e)}")
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing rule: {str(e)}")
+
+
+@router.post("/analyze-rules", response_model=List[SingleRuleResponse])
+async def analyze_rules(
+    request: RulesRequest,
+    response: Response,
+    x_audit_profile: Optional[str] = Header(None),
+):
+    """
+    Evaluates many rules against one transcript in packed LLM calls (RULES_PER_CALL rules per prompt).
+    Rules without a ruleId are answered with their position in the list.
+    """
+    profile_id = f"analyze-rules:{uuid.uuid4()}"
+    if not request.rules:
+        return []
+
+    try:
+        # Rules with a deterministic matcher are answered locally; only the rest go to the LLM
+        verdicts, _ = await run_in_thread("match", split_local_rules, request.transcript, request.rules)
+        positions = [i for i in range(len(request.rules)) if i not in verdicts]
+        rule_list = [{
+            "ruleId": request.rules[i].ruleId if request.rules[i].ruleId is not None else i,
+            "rule": request.rules[i].rule.replace("\n", " ")
+        } for i in positions]
+
+        if rule_list:
+            ticket = admission_controller.estimate(0.0, len(rule_list), transcript_chars=len(request.transcript))
+            async with admission_controller.admit(ticket), profile_request(profile_id, x_audit_profile) as profile:
+                verdicts.update(zip(positions, await evaluate_rules_packed_async(request.transcript, rule_list)))
+            if profile:
+                response.headers["X-Profile-Id"] = profile_id
+
+        results = []
+        for i, rule in enumerate(request.rules):
+            v = verdicts[i]
+            results.append(SingleRuleResponse(
+                ruleId=v["ruleId"] if v.get("ruleId") is not None else i,
+                rule=rule.rule,
+                result=v.get("result", "Error"),
+                reason=v.get("reason", "Could not evaluate"),
+                confidenceScore=v.get("confidenceScore", 0.0)
+            ))
+        return results
+
+    except AdmissionRejected as e:
+        raise rejected_response(e, f"Error processing rules: {str(e)}")
+
+    except TranscriptRejected as e:
+        raise HTTPException(status_code=422, detail=f"Invalid transcript: {str(e)}")
+
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing rule: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error processing rules: {str(e)}")
@@ -0,0 +1,52 @@
+import json
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from dtos.audit_models import LiveAuditStart
+from services.live_audit import LiveAuditSession
+
+router = APIRouter()
+
+
+@router.websocket("/live-audit")
+async def live_audit(websocket: WebSocket):
+    """
+    Live-call audit. The client sends a LiveAuditStart JSON message, then binary audio frames, then
+    {"type": "stop"}; transcript segments and changed verdicts are pushed back as the call progresses.
+    """
+    await websocket.accept()
+    try:
+        session = LiveAuditSession(LiveAuditStart(**await websocket.receive_json()), websocket.send_json)
+    except (ValidationError, ValueError) as e:
+        await websocket.send_json({"type": "error", "error": str(e)})
+        await websocket.close(code=1003)
+        return
+    except WebSocketDisconnect:
+        return
+
+    session.begin()
+    await session.push({"type": "started", "sessionId": session.session_id})
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes"):
+                try:
+                    session.feed(message["bytes"])
+                except ValueError as e:
+                    await session.push({"type": "error", "error": str(e)})
+                    await websocket.close(code=1009)
+                    break
+            elif message.get("text"):
+                try:
+                    stop = json.loads(message["text"]).get("type") == "stop"
+                except (ValueError, AttributeError):
+                    stop = False
+                if stop:
+                    await session.finish()
+                    await websocket.close()
+                    break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await session.close()
@@ -0,0 +1,29 @@
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import FileResponse
+from services.profiling_service import is_privileged, profile_file_path, profile_files
+
+router = APIRouter()
+
+
+def require_privileged(x_audit_profile: Optional[str]) -> None:
+    if not is_privileged(x_audit_profile):
+        raise HTTPException(status_code=403, detail="Profiling token required.")
+
+
+@router.get("/profiles/{job_id}")
+async def list_profile(job_id: str, x_audit_profile: Optional[str] = Header(None)):
+    require_privileged(x_audit_profile)
+    files = profile_files(job_id)
+    if not files:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return {"jobId": job_id, "files": files}
+
+
+@router.get("/profiles/{job_id}/{name}")
+async def download_profile(job_id: str, name: str, x_audit_profile: Optional[str] = Header(None)):
+    require_privileged(x_audit_profile)
+    path = profile_file_path(job_id, name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile file not found.")
+    return FileResponse(path, filename=name)
@@ -0,0 +1,206 @@
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from services.metrics_service import QUEUE_WAIT_SECONDS, Counter, Gauge, current_rss_bytes
+
+# Relative Whisper cost per audio-second, "base" being the reference model.
+MODEL_COST_FACTORS = {
+    "tiny": 0.5,
+    "base": 1.0,
+    "small": 2.0,
+    "medium": 4.0,
+    "large": 8.0,
+}
+
+# Decoded float32 PCM + log-mel frames + ffmpeg output held while a request transcribes.
+AUDIO_MEMORY_BYTES_PER_SECOND = 160_000
+REQUEST_BASE_MEMORY_BYTES = 32 * 1024 * 1024
+
+ADMISSION_REJECTED = Counter("audit_admission_rejected_total", "Requests rejected with 429.", ["reason"])
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted within its wait budget."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class AdmissionTicket:
+    audio_seconds: float
+    rule_count: int
+    cost: float
+    memory_bytes: int
+    admitted_at: float = field(default=0.0)
+
+
+class AdmissionController:
+    """
+    Tracks a global budget of in-flight work measured in cost-weighted audio-seconds and estimated memory.
+    Requests that do not fit wait in a bounded queue, or are rejected with a Retry-After estimate.
+    """
+
+    def __init__(
+        self,
+        max_inflight_cost: float,
+        max_memory_bytes: int,
+        max_rss_bytes: int = 0,
+        max_wait_seconds: float = 30.0,
+        max_queue: int = 32,
+        rule_cost: float = 2.0,
+        default_retry_after: int = 10,
+    ):
+        self.max_inflight_cost = max_inflight_cost
+        self.max_memory_bytes = max_memory_bytes
+        self.max_rss_bytes = max_rss_bytes
+        self.max_wait_seconds = max_wait_seconds
+        self.max_queue = max_queue
+        self.rule_cost = rule_cost
+        self.default_retry_after = default_retry_after
+
+        self._inflight: List[AdmissionTicket] = []
+        self._inflight_cost = 0.0
+        self._inflight_memory = 0
+        self._waiting = 0
+        self._rejected = 0
+        self._seconds_per_cost: Optional[float] = None
+        self._cond: Optional[asyncio.Condition] = None
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        return cls(
+            max_inflight_cost=float(os.getenv("ADMISSION_MAX_INFLIGHT_AUDIO_SECONDS", "3600")),
+            max_memory_bytes=int(float(os.getenv("ADMISSION_MAX_MEMORY_MB", "4096")) * 1024 * 1024),
+            max_rss_bytes=int(float(os.getenv("ADMISSION_MAX_RSS_MB", "0")) * 1024 * 1024),
+            max_wait_seconds=float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "30")),
+            max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "32")),
+            rule_cost=float(os.getenv("ADMISSION_RULE_COST_SECONDS", "2")),
+            default_retry_after=int(os.getenv("ADMISSION_DEFAULT_RETRY_AFTER", "10")),
+        )
+
+    def estimate(self, audio_seconds: float, rule_count: int, model_size: str = "base", transcript_chars: int = 0) -> AdmissionTicket:
+        """
+        Estimates the cost of a request from its probed audio duration, Whisper model and number of rules.
+        """
+        factor = MODEL_COST_FACTORS.get(model_size.split(".")[0], 1.0)
+        cost = audio_seconds * factor + rule_count * self.rule_cost
+        memory = REQUEST_BASE_MEMORY_BYTES + int(audio_seconds * AUDIO_MEMORY_BYTES_PER_SECOND) + transcript_chars * 4
+        return AdmissionTicket(audio_seconds=audio_seconds, rule_count=rule_count, cost=cost, memory_bytes=memory)
+
+    def _condition(self) -> asyncio.Condition:
+        # Created lazily so it binds to the server's running loop, not the import-time one.
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    def _fits(self, ticket: AdmissionTicket) -> bool:
+        if not self._inflight:
+            return True  # an idle worker always takes the next request, however large
+        if self._inflight_cost + ticket.cost > self.max_inflight_cost:
+            return False
+        if self._inflight_memory + ticket.memory_bytes > self.max_memory_bytes:
+            return False
+        if self.max_rss_bytes and current_rss_bytes() > self.max_rss_bytes:
+            return False
+        return True
+
+    def retry_after(self, ticket: AdmissionTicket) -> int:
+        """
+        Estimates how many seconds until enough in-flight work completes for the ticket to fit.
+        """
+        if self._seconds_per_cost is None or not self._inflight:
+            return self.default_retry_after
+
+        now = time.monotonic()
+        finishes = sorted(
+            (t.admitted_at + t.cost * self._seconds_per_cost, t.cost)
+            for t in self._inflight
+        )
+        freed = 0.0
+        needed = self._inflight_cost + ticket.cost - self.max_inflight_cost
+        for finish_at, cost in finishes:
+            freed += cost
+            if freed >= needed:
+                return max(1, math.ceil(finish_at - now))
+        return max(1, math.ceil(finishes[-1][0] - now))
+
+    def _reject(self, ticket: AdmissionTicket, reason: str) -> AdmissionRejected:
+        self._rejected += 1
+        ADMISSION_REJECTED.inc(reason=reason)
+        return AdmissionRejected(reason, self.retry_after(ticket))
+
+    @asynccontextmanager
+    async def admit(self, ticket: AdmissionTicket, max_wait: Optional[float] = None):
+        """
+        Holds budget for the ticket for the duration of the block.
+        max_wait overrides the configured wait; math.inf waits indefinitely (used by batch jobs).
+        """
+        timeout = self.max_wait_seconds if max_wait is None else max_wait
+        cond = self._condition()
+
+        bounded = not math.isinf(timeout)
+
+        async with cond:
+            wait_started = time.perf_counter()
+            if not self._fits(ticket):
+                # Only bounded waiters count against the queue limit; batch jobs throttle themselves.
+                if timeout <= 0 or (bounded and self._waiting >= self.max_queue):
+                    raise self._reject(ticket, "Server is at capacity")
+                if bounded:
+                    self._waiting += 1
+                try:
+                    await asyncio.wait_for(
+                        cond.wait_for(lambda: self._fits(ticket)),
+                        timeout=timeout if bounded else None
+                    )
+                except asyncio.TimeoutError:
+                    raise self._reject(ticket, "Timed out waiting for capacity")
+                finally:
+                    if bounded:
+                        self._waiting -= 1
+
+            QUEUE_WAIT_SECONDS.observe(time.perf_counter() - wait_started, queue="admission")
+            ticket.admitted_at = time.monotonic()
+            self._inflight.append(ticket)
+            self._inflight_cost += ticket.cost
+            self._inflight_memory += ticket.memory_bytes
+
+        try:
+            yield ticket
+        finally:
+            async with cond:
+                self._inflight.remove(ticket)
+                self._inflight_cost -= ticket.cost
+                self._inflight_memory -= ticket.memory_bytes
+
+                if ticket.cost > 0:
+                    observed = (time.monotonic() - ticket.admitted_at) / ticket.cost
+                    if self._seconds_per_cost is None:
+                        self._seconds_per_cost = observed
+                    else:
+                        self._seconds_per_cost = 0.8 * self._seconds_per_cost + 0.2 * observed
+                cond.notify_all()
+
+    def snapshot(self) -> Dict:
+        return {
+            "inflight": len(self._inflight),
+            "inflightCost": self._inflight_cost,
+            "inflightMemoryBytes": self._inflight_memory,
+            "waiting": self._waiting,
+            "rejected": self._rejected,
+            "rssBytes": current_rss_bytes(),
+        }
+
+
+admission_controller = AdmissionController.from_env()
+
+Gauge("audit_admission_inflight_cost", "Cost-weighted audio-seconds in flight.", callback=lambda: admission_controller._inflight_cost)
+Gauge("audit_admission_inflight_memory_bytes", "Estimated memory of in-flight requests.", callback=lambda: admission_controller._inflight_memory)
+Gauge("audit_admission_waiting", "Requests waiting for admission.", callback=lambda: admission_controller._waiting)
@@ -2,7 +2,11 @@ import os
 import subprocess
 import uuid
 import tempfile
-from typing import Tuple
+import time
+from typing import Optional, Tuple
+
+from services.cancellation import AuditCancelled, run_command
+from services.metrics_service import PROBE_SECONDS, TRANSCODE_SECONDS
 
 WHISPER_FORMAT = {
     "format": "wav",
@@ -16,6 +20,7 @@ def transcode_to_whisper_wav(input_path: str) -> str:
     Converts an audio file to Whisper-compatible .wav if needed. Returns same path if already compatible. 
     """
     if input_path.lower().endswith(".wav") and is_whisper_compatible_wav(input_path):
+        TRANSCODE_SECONDS.observe(0.0, result="skipped")
         return input_path  #  Skip transcoding
 
     output_path = os.path.join(tempfile.gettempdir(), f"{uuid.uuid4()}.wav")
@@ -30,12 +35,21 @@ def transcode_to_whisper_wav(input_path: str) -> str:
         output_path
     ]
 
+    started = time.perf_counter()
     try:
-        subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        run_command(command)  # ffmpeg is killed if the audit is abandoned
+        TRANSCODE_SECONDS.observe(time.perf_counter() - started, result="ok")
         return output_path
+    except AuditCancelled:
+        TRANSCODE_SECONDS.observe(time.perf_counter() - started, result="cancelled")
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
     except subprocess.CalledProcessError as e:
+        TRANSCODE_SECONDS.observe(time.perf_counter() - started, result="error")
         raise RuntimeError(f"FFmpeg failed to transcode audio: {e.stderr.decode()}")
 
+@PROBE_SECONDS.timed(probe="wav_compat")
 def is_whisper_compatible_wav(input_path: str) -> bool:
     """
     Returns True if the file is a .wav file with pcm_s16le codec, 16000 Hz sample rate, and mono.
@@ -59,6 +73,7 @@ def is_whisper_compatible_wav(input_path: str) -> bool:
         return False
 
 
+@PROBE_SECONDS.timed(probe="codec")
 def detect_codec_with_ffprobe(input_path: str) -> Tuple[str, str]:
     """
     Uses ffprobe to detect codec and format. Returns (format, codec) tuple.
@@ -81,3 +96,25 @@ def detect_codec_with_ffprobe(input_path: str) -> Tuple[str, str]:
         return format_name, codec
     except subprocess.CalledProcessError as e:
         raise RuntimeError(f"FFprobe failed: {e.stderr.decode()}")
+
+
+@PROBE_SECONDS.timed(probe="duration")
+def probe_audio_duration(input_path: str) -> Optional[float]:
+    """
+    Uses ffprobe to read the container duration in seconds. Returns None if it cannot be determined.
+    """
+    try:
+        result = subprocess.run(
+            [
+                "ffprobe", "-v", "error",
+                "-show_entries", "format=duration",
+                "-of", "default=noprint_wrappers=1:nokey=1",
+                input_path
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=True
+        )
+        return max(0.0, float(result.stdout.decode().strip()))
+    except Exception:
+        return None
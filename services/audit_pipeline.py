@@ -0,0 +1,428 @@
+import asyncio
+import math
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+from dtos.audit_models import AuditRequest, ParameterRule
+from services.admission_service import admission_controller
+from services.cancellation import charge_stage, run_cancellable_thread
+from services.cascade_service import evaluate_param
+from services.audio_format_handler import probe_audio_duration, transcode_to_whisper_wav
+from services.download_service import download_audio, file_sha256, remove_temp_files
+from services.excerpt_service import build_transcript_index, transcript_for_rules
+from services.job_store import JobRecord, job_store
+from services.metrics_service import (
+    SPECULATIVE_RULES, STAGE_CPU_SECONDS, STAGE_RSS_BYTES, STAGE_SECONDS, WEBHOOK_SECONDS, current_rss_bytes, record_cache
+)
+from services.preflight_service import PREFLIGHT_ENABLED, check_duration, preflight_audio
+from services.profiling_service import wrap_for_thread
+from services.rule_engine import align_verdicts, merge_verdicts, split_local_rules
+from services.singleflight import audio_flight, transcript_flight
+from services.speculative_service import SPECULATIVE_DRAFT_PROFILE, EvidenceComparer, draft_verdict_holds, speculation_enabled
+from services.transcript_ingest import parse_transcript, render_segments
+from services.transcript_service import format_transcript_without_speaker
+from services.transcription_profiles import resolve_transcription_profile
+from services.transcription_workers import transcribe_audio
+
+# Job kinds, one per entry point; they decide the payload shape and whether a webhook is sent.
+KIND_AUDIT = "analyze-audio"
+KIND_TESTING = "analyze-audio-testing"
+KIND_BATCH = "analyze-audio-batch"
+
+_recovery_tasks = set()
+
+
+@asynccontextmanager
+async def _no_stage(name: str):
+    yield
+
+
+async def run_in_thread(stage_name: str, fn: Callable, *args):
+    """
+    Runs a blocking stage in a worker thread, recording its wall time, thread CPU time and the RSS after it.
+    Cancelling the caller cancels the stage's scope (killing its subprocess or transcription worker).
+    """
+    fn = wrap_for_thread(fn)
+
+    def timed():
+        started = time.perf_counter()
+        cpu_started = time.thread_time()
+        try:
+            return fn(*args)
+        finally:
+            wall, cpu = time.perf_counter() - started, time.thread_time() - cpu_started
+            STAGE_SECONDS.observe(wall, stage=stage_name)
+            STAGE_CPU_SECONDS.inc(cpu, stage=stage_name)
+            STAGE_RSS_BYTES.set(current_rss_bytes(), stage=stage_name)
+            charge_stage(stage_name, wall, cpu)
+
+    return await run_cancellable_thread(timed)
+
+
+def count_rules(request: AuditRequest) -> int:
+    return sum(len(param.ruleList) for param in request.parameter)
+
+
+def param_key(index: int, param) -> str:
+    return f"{index}:{param.id}"
+
+
+def build_payload(kind: str, request: AuditRequest, transcript, evaluations: List[Dict]) -> Dict:
+    if kind == KIND_AUDIT:
+        return {
+            "sampleId": request.sampleId,
+            "status": "completed",
+            "transcript": format_transcript_without_speaker(transcript),
+            "evaluations": evaluations
+        }
+
+    payload = {
+        "audioFileId": request.audioFileId,
+        "userUuid": request.userUuid,
+        "status": "completed",
+        "transcript": format_transcript_without_speaker(transcript) if not request.transcription else None,
+        "evaluations": evaluations
+    }
+    if kind == KIND_BATCH:
+        payload["sampleId"] = request.sampleId
+    return payload
+
+
+def transcript_chars(transcript) -> int:
+    if isinstance(transcript, str):
+        return len(transcript)
+    return sum(len(seg["text"]) for seg in transcript)
+
+
+async def transcribe_draft(audio_path: str, language: Optional[str], draft: asyncio.Future) -> None:
+    try:
+        segments = await run_in_thread("transcribe_draft", transcribe_audio, audio_path, SPECULATIVE_DRAFT_PROFILE, language)
+    except Exception as e:
+        print(f"[Speculative] Draft transcription failed: {e}")
+        return
+    if segments and not draft.done():
+        draft.set_result(segments)
+
+
+# Downloaded files by audioUrl, shared by every request holding the URL; removed when the last one lets go
+_audio_files: Dict[str, List[str]] = {}
+_audio_users: Dict[str, int] = {}
+
+
+def _hold_audio(url: str) -> Callable[[], None]:
+    """Registers a user of the URL's downloaded files; returns the release function."""
+    _audio_users[url] = _audio_users.get(url, 0) + 1
+
+    def release():
+        _audio_users[url] -= 1
+        if not _audio_users[url]:
+            del _audio_users[url]
+            remove_temp_files(*_audio_files.pop(url, []))
+
+    return release
+
+
+def _track_audio(url: str, path: str) -> None:
+    if url in _audio_users:
+        _audio_files.setdefault(url, []).append(path)
+    else:
+        remove_temp_files(path)  # every request gave up while it was downloading
+
+
+async def transcribe_from_url(
+    request: AuditRequest,
+    stage: Callable,
+    max_wait: Optional[float],
+    stats: Dict,
+    draft: Optional[asyncio.Future] = None,
+) -> List[Dict]:
+    """
+    Downloads, transcodes and transcribes request.audioUrl under admission control. Concurrent requests
+    for the same URL share one download; requests whose content hashes match (for the same profile and
+    language) share the transcription. The shared work runs without any caller's stage limits: each
+    request passes its own stages around its wait for it. Admission budget is reserved only by the
+    request that starts a transcription, on its own max_wait, and is held by the shared work until it ends.
+    Sets stats["audioSeconds"].
+    With `draft`, a SPECULATIVE_DRAFT_PROFILE transcription runs alongside and resolves it when it
+    finishes first (only for the request that started the shared transcription).
+    """
+    url, profile, language = request.audioUrl, request.transcriptionProfile, request.language
+    # Validate the profile before any download work
+    model_size = resolve_transcription_profile(profile)["model"]
+
+    async def download():
+        # Reject oversize, overlong, empty or undecodable audio from its first bytes
+        if PREFLIGHT_ENABLED:
+            await run_in_thread("preflight", preflight_audio, url)
+        audio_path = await run_in_thread("download", download_audio, url)
+        _track_audio(url, audio_path)
+        return audio_path, await run_in_thread("hash", file_sha256, audio_path)
+
+    def transcode_and_transcribe():
+        # Called when this request starts the shared transcription: the work keeps this URL's download
+        # and this request's admission budget even if it gives up while others still wait for the result
+        release = _hold_audio(url)
+        admitted = reservation.pop_all()
+
+        async def work():
+            transcoded_path = None
+            try:
+                transcoded_path = await run_in_thread("transcode", transcode_to_whisper_wav, audio_path)
+                if draft is None:
+                    return await run_in_thread("transcribe", transcribe_audio, transcoded_path, profile, language)
+                drafting = asyncio.ensure_future(transcribe_draft(transcoded_path, language, draft))
+                try:
+                    return await run_in_thread("transcribe", transcribe_audio, transcoded_path, profile, language)
+                finally:
+                    drafting.cancel()  # a draft finishing after the real transcript is useless
+            finally:
+                if transcoded_path != audio_path:
+                    remove_temp_files(transcoded_path)
+                release()
+                await admitted.aclose()
+
+        return work()
+
+    release = _hold_audio(url)
+    reservation = AsyncExitStack()
+    try:
+        async with stage("download"):
+            audio_path, digest = await audio_flight.do(url, download)
+        async with stage("decode"):
+            duration = await run_in_thread("probe", probe_audio_duration, audio_path)
+        check_duration(duration)
+        duration = duration or 0.0  # unknown: admitted at the minimum cost
+        stats["audioSeconds"] = duration
+
+        key = (digest, profile, language)
+        async with stage("transcribe"):
+            if not transcript_flight.running(key):
+                # Only a request about to start the transcription reserves budget for it, on its own terms:
+                # an interactive request isn't queued indefinitely, and a batch item is never rejected
+                ticket = admission_controller.estimate(duration, 0, model_size=model_size)
+                await reservation.enter_async_context(admission_controller.admit(ticket, max_wait=max_wait))
+            # Joining is synchronous from here, so a transcription running now is joined without a reservation
+            return await transcript_flight.do(key, transcode_and_transcribe)
+    finally:
+        await reservation.aclose()  # still here if another request started the transcription while this one waited
+        release()
+
+
+async def evaluate_with_llm(param, remaining: List, excerpt_index, full_text: str, stage: Callable) -> List[Dict]:
+    if not remaining:
+        return []
+    rules = [getattr(r, "rule", r) for r in remaining]
+    subset = ParameterRule(id=param.id, name=param.name, ruleList=remaining)
+    async with stage("evaluate"):
+        llm_evaluation = await evaluate_param(transcript_for_rules(excerpt_index, full_text, rules), subset)
+    return llm_evaluation["rules"]
+
+
+async def evaluate_rules(param, transcript, excerpt_index, full_text: str, stage: Callable) -> Dict:
+    # Rules with a deterministic matcher are resolved locally; only the rest cost an LLM call
+    local, remaining = await run_in_thread("match", split_local_rules, transcript, param.ruleList)
+    llm_verdicts = await evaluate_with_llm(param, remaining, excerpt_index, full_text, stage)
+    return {"id": param.id, "name": param.name, "rules": merge_verdicts(param.ruleList, local, llm_verdicts)}
+
+
+async def evaluate_draft(request: AuditRequest, draft: List[Dict], stage: Callable, max_wait: Optional[float]) -> Dict[str, Dict]:
+    """Evaluates every parameter against the draft transcript; returns evaluations by param_key."""
+    ticket = admission_controller.estimate(0.0, count_rules(request), transcript_chars=transcript_chars(draft))
+    async with admission_controller.admit(ticket, max_wait=max_wait):
+        excerpt_index = await run_in_thread("excerpt_index", build_transcript_index, draft, request.transcriptExcerpts)
+        full_text = render_segments(draft)
+        evaluations = await asyncio.gather(*[
+            evaluate_rules(param, draft, excerpt_index, full_text, stage)
+            for param in request.parameter
+        ])
+    return {param_key(index, param): evaluation for index, (param, evaluation) in enumerate(zip(request.parameter, evaluations))}
+
+
+async def transcribe_speculatively(request: AuditRequest, stage: Callable, max_wait: Optional[float], stats: Dict):
+    """
+    transcribe_from_url with the draft transcript evaluated while the requested profile is still running.
+    Returns (transcript, comparer, draft evaluations by param_key); the last two are None when no draft
+    arrived before the transcript (or its evaluation failed).
+    """
+    draft = asyncio.get_running_loop().create_future()
+    transcription = asyncio.ensure_future(transcribe_from_url(request, stage, max_wait, stats, draft))
+    drafting = None
+    try:
+        await asyncio.wait({transcription, draft}, return_when=asyncio.FIRST_COMPLETED)
+        if not draft.done():
+            draft.cancel()
+            return await transcription, None, None
+        drafting = asyncio.ensure_future(evaluate_draft(request, draft.result(), stage, max_wait))
+        transcript = await transcription
+        try:
+            draft_evaluations = await drafting
+        except Exception as e:
+            print(f"[Speculative] Draft evaluation failed, evaluating from scratch: {e}")
+            return transcript, None, None
+        comparer = await run_in_thread("speculative_compare", EvidenceComparer, draft.result(), transcript)
+        return transcript, comparer, draft_evaluations
+    except BaseException:
+        transcription.cancel()
+        if drafting is not None:
+            drafting.cancel()
+        raise
+
+
+async def reconcile_evaluation(
+    param, draft_evaluation: Dict, comparer: EvidenceComparer, transcript, excerpt_index, full_text: str, stage: Callable
+) -> Dict:
+    """
+    Keeps draft verdicts whose evidence reads the same in the accurate transcript and re-evaluates the
+    rest. Local matchers are re-run on the accurate transcript, since they cost nothing.
+    """
+    local, _ = await run_in_thread("match", split_local_rules, transcript, param.ruleList)
+    draft_verdicts = align_verdicts(param.ruleList, draft_evaluation["rules"])
+    kept = dict(local)
+    stale = []
+    for i, item in enumerate(param.ruleList):
+        if i in local:
+            continue
+        if draft_verdict_holds(comparer, getattr(item, "rule", item), draft_verdicts[i]):
+            kept[i] = draft_verdicts[i]
+        else:
+            stale.append(i)
+    SPECULATIVE_RULES.inc(len(kept) - len(local), result="kept")
+    SPECULATIVE_RULES.inc(len(stale), result="reevaluated")
+
+    llm_verdicts = await evaluate_with_llm(param, [param.ruleList[i] for i in stale], excerpt_index, full_text, stage)
+    return {"id": param.id, "name": param.name, "rules": merge_verdicts(param.ruleList, kept, llm_verdicts)}
+
+
+async def run_audit(
+    job_id: str,
+    kind: str,
+    request: AuditRequest,
+    stage: Callable = _no_stage,
+    max_wait: Optional[float] = None,
+    stats: Optional[Dict] = None,
+) -> Dict:
+    """
+    Runs or resumes one audit job and returns its payload. Stages already recorded in the job
+    store (transcript, per-parameter evaluations) are reused instead of recomputed.
+    `stage` wraps each pipeline stage, letting the batch pipeline apply its per-stage limits;
+    `stats`, when given, is filled with the probed audio duration.
+    """
+    stats = stats if stats is not None else {}
+    record = job_store.create_or_get(job_id, kind, request)
+    record_cache("job_result", record.status == "completed" and record.result is not None)
+    if record.status == "completed" and record.result is not None:
+        print(f"[JobStore] Returning stored result for {job_id}")
+        return record.result
+
+    job_store.mark_running(job_id)
+
+    try:
+        transcript = record.transcript
+        comparer, draft_evaluations = None, None
+        supplied = request.transcription if kind != KIND_AUDIT else None
+
+        if not (supplied and supplied.strip()):
+            record_cache("job_transcript", bool(transcript))
+
+        # An empty stored transcript is never resumed from: it may be what an earlier failure left behind
+        if transcript:
+            print(f"[JobStore] Resuming {job_id} from stored transcript")
+        elif supplied and supplied.strip():
+            transcript = await run_in_thread("ingest", parse_transcript, supplied)
+        else:
+            # Steps 1-4: download, transcode and transcribe (shared with concurrent requests for the same audio)
+            if speculation_enabled(request):
+                # Rules are evaluated on a fast draft meanwhile; only those whose evidence changed are redone below
+                transcript, comparer, draft_evaluations = await transcribe_speculatively(request, stage, max_wait, stats)
+            else:
+                transcript = await transcribe_from_url(request, stage, max_wait, stats)
+            if transcript:
+                job_store.save_transcript(job_id, transcript)
+
+        ticket = admission_controller.estimate(0.0, count_rules(request), transcript_chars=transcript_chars(transcript))
+        async with admission_controller.admit(ticket, max_wait=max_wait):
+            # Step 5: Evaluate parameters not already evaluated by an earlier attempt
+            done = job_store.get_evaluations(job_id)
+            excerpt_index = None
+            full_text = None
+            if len(done) < len(request.parameter):
+                excerpt_index = await run_in_thread("excerpt_index", build_transcript_index, transcript, request.transcriptExcerpts)
+                full_text = render_segments(transcript)  # rendered once, shared by every parameter's prompt
+
+            async def evaluate(index: int, param) -> Dict:
+                key = param_key(index, param)
+                record_cache("job_evaluation", key in done)
+                if key in done:
+                    return done[key]
+                if draft_evaluations is not None and key in draft_evaluations:
+                    evaluation = await reconcile_evaluation(
+                        param, draft_evaluations[key], comparer, transcript, excerpt_index, full_text, stage
+                    )
+                else:
+                    evaluation = await evaluate_rules(param, transcript, excerpt_index, full_text, stage)
+                job_store.save_evaluation(job_id, key, evaluation)
+                return evaluation
+
+            evaluations = await asyncio.gather(*[
+                evaluate(index, param)
+                for index, param in enumerate(request.parameter)
+            ])
+
+        payload = build_payload(kind, request, transcript, evaluations)
+        job_store.complete(job_id, payload)
+        return payload
+
+    except asyncio.CancelledError:
+        job_store.fail(job_id, "cancelled")
+        raise
+
+    except Exception as e:
+        job_store.fail(job_id, str(e))
+        raise
+
+
+async def deliver_webhook(job_id: str, url: str, payload: Dict) -> None:
+    record = job_store.get(job_id)
+    if record and record.webhook_status == "sent":
+        return
+
+    job_store.set_webhook_status(job_id, "pending")
+    started = time.perf_counter()
+    try:
+        response = await run_in_thread("webhook", lambda: requests.post(url, json=payload))
+        WEBHOOK_SECONDS.observe(time.perf_counter() - started, status=str(response.status_code))
+        print(f"[Webhook Success] Status: {response.status_code}, Response: {response.text}")
+        job_store.set_webhook_status(job_id, "sent")
+    except Exception as e:
+        WEBHOOK_SECONDS.observe(time.perf_counter() - started, status="error")
+        print(f"[Webhook Error on success] {str(e)}")
+        job_store.set_webhook_status(job_id, "failed")
+
+
+async def _recover_job(record: JobRecord, webhook_urls: Dict[str, Optional[str]]) -> None:
+    try:
+        request = AuditRequest(**record.request)
+        payload = await run_audit(record.job_id, record.kind, request, max_wait=math.inf)
+        url = webhook_urls.get(record.kind)
+        if url:
+            await deliver_webhook(record.job_id, url, payload)
+        print(f"[JobStore] Recovered job {record.job_id}")
+    except Exception as e:
+        print(f"[JobStore] Recovery failed for {record.job_id}: {e}")
+
+
+def recover_unfinished_jobs(webhook_urls: Dict[str, Optional[str]]) -> int:
+    """
+    Re-queues jobs left unfinished by a crashed or restarted worker. Call once on startup.
+    """
+    records = job_store.claim_orphaned_jobs()
+    for record in records:
+        task = asyncio.create_task(_recover_job(record, webhook_urls))
+        _recovery_tasks.add(task)
+        task.add_done_callback(_recovery_tasks.discard)
+    if records:
+        print(f"[JobStore] Re-queued {len(records)} unfinished jobs")
+    return len(records)
@@ -0,0 +1,209 @@
+import asyncio
+import math
+import os
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+from dtos.audit_models import AuditRequest
+from services.audit_pipeline import KIND_BATCH, deliver_webhook, run_audit
+from services.job_store import derive_job_id
+from services.metrics_service import QUEUE_WAIT_SECONDS
+from services.preflight_service import AudioRejected
+from services.transcript_ingest import TranscriptRejected
+
+STAGE_LIMITS = {
+    "download": int(os.getenv("BATCH_DOWNLOAD_CONCURRENCY", "8")),
+    "decode": int(os.getenv("BATCH_DECODE_CONCURRENCY", str(os.cpu_count() or 2))),
+    "transcribe": int(os.getenv("BATCH_TRANSCRIBE_CONCURRENCY", "1")),
+    "evaluate": int(os.getenv("BATCH_LLM_CONCURRENCY", "16")),
+}
+
+# Items of one batch allowed past "queued" at once; bounds downloaded-but-unprocessed files on disk.
+BATCH_PREFETCH = int(os.getenv("BATCH_PREFETCH", "16"))
+MAX_RETAINED_BATCHES = int(os.getenv("BATCH_MAX_RETAINED", "100"))
+
+
+class StagePool:
+    """
+    One semaphore per pipeline stage, shared by every batch so the limits are global.
+    Tracks how many items are running in / waiting for each stage.
+    """
+
+    def __init__(self, limits: Dict[str, int]):
+        self.limits = limits
+        self._semaphores: Optional[Dict[str, asyncio.Semaphore]] = None
+        self.active = {stage: 0 for stage in limits}
+        self.waiting = {stage: 0 for stage in limits}
+
+    def _semaphore(self, stage: str) -> asyncio.Semaphore:
+        if self._semaphores is None:
+            self._semaphores = {name: asyncio.Semaphore(limit) for name, limit in self.limits.items()}
+        return self._semaphores[stage]
+
+    @asynccontextmanager
+    async def stage(self, stage: str, item: "BatchItem"):
+        self.waiting[stage] += 1
+        item.status = f"waiting:{stage}"
+        wait_started = time.perf_counter()
+        try:
+            await self._semaphore(stage).acquire()
+        finally:
+            self.waiting[stage] -= 1
+        QUEUE_WAIT_SECONDS.observe(time.perf_counter() - wait_started, queue=f"batch_{stage}")
+
+        self.active[stage] += 1
+        item.status = stage
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            item.stage_seconds[stage] = item.stage_seconds.get(stage, 0.0) + time.monotonic() - started
+            self.active[stage] -= 1
+            self._semaphore(stage).release()
+
+    def snapshot(self) -> Dict:
+        return {
+            stage: {"limit": self.limits[stage], "active": self.active[stage], "waiting": self.waiting[stage]}
+            for stage in self.limits
+        }
+
+
+stage_pool = StagePool(STAGE_LIMITS)
+
+
+class BatchItem:
+    def __init__(self, index: int, request: AuditRequest):
+        self.index = index
+        self.request = request
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.error_code: Optional[str] = None
+        self.audio_seconds = 0.0
+        self.stage_seconds: Dict[str, float] = {}
+        self.result: Optional[Dict] = None
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self, include_result: bool = False) -> Dict:
+        data = {
+            "index": self.index,
+            "sampleId": self.request.sampleId,
+            "audioFileId": self.request.audioFileId,
+            "status": self.status,
+            "audioSeconds": round(self.audio_seconds, 2),
+            "stageSeconds": {k: round(v, 3) for k, v in self.stage_seconds.items()},
+        }
+        if self.error:
+            data["error"] = self.error
+        if self.error_code:
+            data["errorCode"] = self.error_code
+        if include_result and self.result is not None:
+            data["result"] = self.result
+        return data
+
+
+class BatchJob:
+    def __init__(self, items: List[AuditRequest], webhook_url: Optional[str] = None):
+        self.batch_id = str(uuid.uuid4())
+        self.items = [BatchItem(i, req) for i, req in enumerate(items)]
+        self.webhook_url = webhook_url
+        self.created_at = time.time()
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def progress(self, include_results: bool = False) -> Dict:
+        counts: Dict[str, int] = {}
+        for item in self.items:
+            key = item.status.split(":")[0] if item.status.startswith("waiting") else item.status
+            counts[key] = counts.get(key, 0) + 1
+
+        done = [item for item in self.items if item.status in ("completed", "error")]
+        elapsed = (self.finished or time.monotonic()) - self.started
+        audio_seconds = sum(item.audio_seconds for item in done)
+
+        return {
+            "batchId": self.batch_id,
+            "status": "completed" if self.finished else "running",
+            "total": len(self.items),
+            "counts": counts,
+            "elapsedSeconds": round(elapsed, 2),
+            "throughput": {
+                "itemsPerMinute": round(len(done) / elapsed * 60, 2) if elapsed > 0 else 0.0,
+                "audioSecondsPerSecond": round(audio_seconds / elapsed, 2) if elapsed > 0 else 0.0,
+            },
+            "stages": stage_pool.snapshot(),
+            "items": [item.to_dict(include_results) for item in self.items],
+        }
+
+
+_batches: "OrderedDict[str, BatchJob]" = OrderedDict()
+
+
+def get_batch(batch_id: str) -> Optional[BatchJob]:
+    return _batches.get(batch_id)
+
+
+def _retain(job: BatchJob) -> None:
+    _batches[job.batch_id] = job
+    while len(_batches) > MAX_RETAINED_BATCHES:
+        oldest_id, oldest = next(iter(_batches.items()))
+        if not oldest.finished:
+            break
+        _batches.pop(oldest_id)
+
+
+async def _run_item(job: BatchJob, item: BatchItem) -> None:
+    request = item.request
+    job_id = derive_job_id(KIND_BATCH, request)
+    stats: Dict = {}
+
+    try:
+        # Batch items never get a 429; they wait for capacity instead.
+        item.result = await run_audit(
+            job_id, KIND_BATCH, request,
+            stage=lambda name: stage_pool.stage(name, item),
+            max_wait=math.inf,
+            stats=stats,
+        )
+        item.status = "completed"
+
+        if job.webhook_url:
+            await deliver_webhook(job_id, job.webhook_url, item.result)
+
+    except Exception as e:
+        item.status = "error"
+        item.error = str(e)
+        item.error_code = e.code if isinstance(e, (AudioRejected, TranscriptRejected)) else None
+        print(f"[Batch {job.batch_id}] Item {item.index} failed: {e}")
+
+    finally:
+        item.audio_seconds = stats.get("audioSeconds", 0.0)
+        item.finished_at = time.monotonic()
+
+
+async def _run_batch(job: BatchJob) -> None:
+    window = asyncio.Semaphore(BATCH_PREFETCH)
+
+    async def run_windowed(item: BatchItem):
+        async with window:
+            await _run_item(job, item)
+
+    try:
+        await asyncio.gather(*[run_windowed(item) for item in job.items])
+    finally:
+        job.finished = time.monotonic()
+        print(f"[Batch {job.batch_id}] Finished {len(job.items)} items in {job.finished - job.started:.1f}s")
+
+
+def submit_batch(items: List[AuditRequest], webhook_url: Optional[str] = None) -> BatchJob:
+    """
+    Schedules every item through the staged pipeline. A window of items runs at once and each
+    stage is throttled separately, so downloads of later items overlap transcription of earlier ones.
+    """
+    job = BatchJob(items, webhook_url)
+    _retain(job)
+    job.task = asyncio.create_task(_run_batch(job))
+    return job
@@ -0,0 +1,339 @@
+import asyncio
+import contextvars
+import os
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, List, Optional
+
+from services.metrics_service import AUDITS_CANCELLED, WASTED_CPU_SECONDS, WASTED_STAGE_SECONDS, WASTED_TOKENS
+
+# Deadlines and cancellation for audits. The deadline and the audit's usage ledger live in contextvars,
+# so they follow the audit into child tasks and into asyncio.to_thread workers. Blocking stages get a
+# CancelScope: when the awaiting coroutine is cancelled, the scope kills what the thread registered
+# (ffmpeg, a transcription worker) and makes cooperative loops (download) stop at their next check.
+
+AUDIT_TIMEOUT_SECONDS = float(os.getenv("AUDIT_TIMEOUT_SECONDS", "0"))  # 0 = no deadline unless the header sets one
+CANCEL_ON_DISCONNECT = os.getenv("CANCEL_ON_DISCONNECT", "true").lower() == "true"
+DISCONNECT_POLL_SECONDS = float(os.getenv("DISCONNECT_POLL_SECONDS", "1"))
+
+DEADLINE_EXCEEDED = "deadline_exceeded"
+CLIENT_DISCONNECTED = "client_disconnected"
+
+_deadline: contextvars.ContextVar = contextvars.ContextVar("audit_deadline", default=None)  # time.monotonic() value
+_scope: contextvars.ContextVar = contextvars.ContextVar("cancel_scope", default=None)
+_usage: contextvars.ContextVar = contextvars.ContextVar("audit_usage", default=None)
+
+
+class AuditCancelled(Exception):
+    """Raised when an audit is abandoned; `reason` is DEADLINE_EXCEEDED or CLIENT_DISCONNECTED."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Audit cancelled: {reason.replace('_', ' ')}")
+        self.reason = reason
+
+
+class AuditUsage:
+    """
+    Work spent on one audit. Once the audit is cancelled, what it spent so far (and anything still
+    finishing in threads afterwards) is reported as wasted.
+    """
+
+    def __init__(self, label: str):
+        self.label = label
+        self.stage_seconds: dict = {}
+        self.cpu_seconds: dict = {}
+        self.tokens = {"prompt": 0, "completion": 0}
+        self.reason: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def charge_stage(self, stage: str, wall: float, cpu: float) -> None:
+        with self._lock:
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + wall
+            self.cpu_seconds[stage] = self.cpu_seconds.get(stage, 0.0) + cpu
+            reason = self.reason
+        if reason:
+            WASTED_STAGE_SECONDS.inc(wall, stage=stage, reason=reason)
+            WASTED_CPU_SECONDS.inc(cpu, stage=stage, reason=reason)
+
+    def charge_tokens(self, prompt_tokens: int, completion_tokens: int) -> None:
+        with self._lock:
+            self.tokens["prompt"] += prompt_tokens
+            self.tokens["completion"] += completion_tokens
+            reason = self.reason
+        if reason:
+            WASTED_TOKENS.inc(prompt_tokens, kind="prompt", reason=reason)
+            WASTED_TOKENS.inc(completion_tokens, kind="completion", reason=reason)
+
+    def cancelled(self, reason: str) -> None:
+        with self._lock:
+            if self.reason:
+                return
+            self.reason = reason
+            stage_seconds, cpu_seconds, tokens = dict(self.stage_seconds), dict(self.cpu_seconds), dict(self.tokens)
+        AUDITS_CANCELLED.inc(reason=reason)
+        for stage, seconds in stage_seconds.items():
+            WASTED_STAGE_SECONDS.inc(seconds, stage=stage, reason=reason)
+            WASTED_CPU_SECONDS.inc(cpu_seconds[stage], stage=stage, reason=reason)
+        for kind, count in tokens.items():
+            WASTED_TOKENS.inc(count, kind=kind, reason=reason)
+        print(
+            f"[Cancel] {self.label} ({reason}): discarded {sum(stage_seconds.values()):.1f}s of stage time, "
+            f"{sum(cpu_seconds.values()):.1f}s CPU, {tokens['prompt']}+{tokens['completion']} tokens"
+        )
+
+
+class SharedUsage:
+    """
+    Ledger for work shared by several audits (single-flight). Charges are held until the work ends, then
+    split evenly across the ledgers of the audits that waited on it, so an audit cancelled mid-flight has
+    its share reported as wasted. Anything charged later (threads still finishing) is split straight away.
+    """
+
+    reason: Optional[str] = None  # shared work is never itself cancelled for an audit's reason
+
+    def __init__(self):
+        self.ledgers: list = []
+        self.stage_charges: List[tuple] = []
+        self.tokens = [0, 0]
+        self.settled = False
+        self._lock = threading.Lock()
+
+    def join(self, usage) -> None:
+        if usage is None:
+            return
+        with self._lock:
+            if all(ledger is not usage for ledger in self.ledgers):
+                self.ledgers.append(usage)
+
+    def charge_stage(self, stage: str, wall: float, cpu: float) -> None:
+        with self._lock:
+            if not self.settled:
+                self.stage_charges.append((stage, wall, cpu))
+                return
+            ledgers = list(self.ledgers)
+        for ledger in ledgers:
+            ledger.charge_stage(stage, wall / len(ledgers), cpu / len(ledgers))
+
+    def charge_tokens(self, prompt_tokens: int, completion_tokens: int) -> None:
+        with self._lock:
+            if not self.settled:
+                self.tokens[0] += prompt_tokens
+                self.tokens[1] += completion_tokens
+                return
+            ledgers = list(self.ledgers)
+        for ledger, (prompt, completion) in zip(ledgers, _split_tokens(prompt_tokens, completion_tokens, len(ledgers))):
+            ledger.charge_tokens(prompt, completion)
+
+    def settle(self) -> None:
+        """Called once the shared work has finished or been cancelled."""
+        with self._lock:
+            if self.settled:
+                return
+            self.settled = True
+            stage_charges, tokens, ledgers = self.stage_charges, self.tokens, list(self.ledgers)
+        for stage, wall, cpu in stage_charges:
+            for ledger in ledgers:
+                ledger.charge_stage(stage, wall / len(ledgers), cpu / len(ledgers))
+        for ledger, (prompt, completion) in zip(ledgers, _split_tokens(*tokens, len(ledgers))):
+            ledger.charge_tokens(prompt, completion)
+
+
+def _split_tokens(prompt_tokens: int, completion_tokens: int, parts: int) -> List[tuple]:
+    """Integer shares that add up to the totals; the first ledgers take the remainder."""
+    return [
+        (prompt_tokens // parts + (i < prompt_tokens % parts), completion_tokens // parts + (i < completion_tokens % parts))
+        for i in range(parts)
+    ]
+
+
+class CancelScope:
+    """Cancellation handle for one blocking call running in a worker thread."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks: List[Callable] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"[Cancel] Cleanup callback failed: {e}")
+
+    def add_callback(self, callback: Callable) -> None:
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback: Callable) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+
+# <------- Helpers for code running inside an audit ------->
+
+def remaining_seconds() -> Optional[float]:
+    deadline = _deadline.get()
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+def check_cancelled() -> None:
+    """Raises AuditCancelled if the calling stage was abandoned or the audit's deadline has passed."""
+    scope = _scope.get()
+    if scope is not None and scope.cancelled:
+        usage = _usage.get()
+        raise AuditCancelled(usage.reason if usage is not None and usage.reason else CLIENT_DISCONNECTED)
+    if remaining_seconds() == 0.0:
+        raise AuditCancelled(DEADLINE_EXCEEDED)
+
+
+@contextmanager
+def on_cancel(callback: Callable):
+    """Runs callback (e.g. killing a child process) if the enclosing stage is cancelled while inside the block."""
+    scope = _scope.get()
+    if scope is None:
+        yield
+        return
+    scope.add_callback(callback)
+    try:
+        yield
+    finally:
+        scope.remove_callback(callback)
+
+
+def current_usage():
+    """The calling audit's ledger (AuditUsage, or SharedUsage inside shared work); None outside audits."""
+    return _usage.get()
+
+
+def detached_context(usage: Optional[SharedUsage] = None) -> contextvars.Context:
+    """
+    A copy of the current context without the audit's deadline and cancel scope, charging `usage` instead of
+    the audit's ledger, for work that outlives the caller that started it (shared single-flight work).
+    Such work stops by being cancelled.
+    """
+    context = contextvars.copy_context()
+    context.run(_deadline.set, None)
+    context.run(_usage.set, usage)
+    context.run(_scope.set, None)
+    return context
+
+
+def charge_stage(stage: str, wall: float, cpu: float) -> None:
+    usage = _usage.get()
+    if usage is not None:
+        usage.charge_stage(stage, wall, cpu)
+
+
+def charge_tokens(prompt_tokens: int, completion_tokens: int) -> None:
+    usage = _usage.get()
+    if usage is not None:
+        usage.charge_tokens(prompt_tokens, completion_tokens)
+
+
+def run_command(command: List[str]) -> bytes:
+    """
+    subprocess.run(check=True) for long-running tools such as ffmpeg: the process is killed when the
+    stage is cancelled or the audit deadline passes. Returns stdout.
+    """
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    with on_cancel(process.kill):
+        try:
+            stdout, stderr = process.communicate(timeout=remaining_seconds())
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise AuditCancelled(DEADLINE_EXCEEDED)
+    check_cancelled()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command, stdout, stderr)
+    return stdout
+
+
+async def run_cancellable_thread(fn: Callable, *args):
+    """
+    asyncio.to_thread with a CancelScope: if the awaiting coroutine is cancelled, the scope is cancelled
+    too, so the thread's registered cleanups run instead of it working on for nobody.
+    """
+    scope = CancelScope()
+    token = _scope.set(scope)  # copied into the thread's context by to_thread
+    try:
+        return await asyncio.to_thread(fn, *args)
+    except asyncio.CancelledError:
+        scope.cancel()
+        raise
+    finally:
+        _scope.reset(token)
+
+
+# <------- Request guard ------->
+
+def resolve_timeout(header_value: Optional[str]) -> Optional[float]:
+    """Deadline in seconds from the X-Audit-Timeout header, else AUDIT_TIMEOUT_SECONDS; None for no deadline."""
+    try:
+        seconds = float(header_value) if header_value else AUDIT_TIMEOUT_SECONDS
+    except ValueError:
+        seconds = AUDIT_TIMEOUT_SECONDS
+    return seconds if seconds > 0 else None
+
+
+async def run_guarded(label: str, work: Callable[[], Awaitable], http_request=None, timeout: Optional[float] = None):
+    """
+    Runs work() as a task that is cancelled when the deadline passes or (with CANCEL_ON_DISCONNECT) the
+    client disconnects; raises AuditCancelled in that case. Cancelling the caller cancels the work too.
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    usage = AuditUsage(label)
+    tokens = (_deadline.set(deadline), _usage.set(usage))
+    try:
+        task = asyncio.ensure_future(work())  # the task's context carries the deadline and ledger
+    finally:
+        _usage.reset(tokens[1])
+        _deadline.reset(tokens[0])
+
+    reason = None
+    try:
+        while not task.done():
+            wait = DISCONNECT_POLL_SECONDS
+            if deadline is not None:
+                wait = min(wait, max(0.0, deadline - time.monotonic()))
+            await asyncio.wait({task}, timeout=wait)
+            if task.done():
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                reason = DEADLINE_EXCEEDED
+            elif CANCEL_ON_DISCONNECT and http_request is not None and await http_request.is_disconnected():
+                reason = CLIENT_DISCONNECTED
+            if reason:
+                break
+    except asyncio.CancelledError:
+        # The request itself was cancelled (server shutdown, or the server dropping a disconnected client)
+        usage.cancelled(CLIENT_DISCONNECTED)
+        task.cancel()
+        raise
+
+    if reason is None:
+        if not task.cancelled() and isinstance(task.exception(), AuditCancelled):
+            usage.cancelled(task.exception().reason)
+        return task.result()
+
+    usage.cancelled(reason)
+    task.cancel()
+    try:
+        await task
+    except (asyncio.CancelledError, Exception):
+        pass
+    raise AuditCancelled(reason)
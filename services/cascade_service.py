@@ -0,0 +1,108 @@
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional
+
+from dtos.audit_models import ParameterRule
+from services.metrics_service import CASCADE_ESCALATIONS, CASCADE_RULES, CASCADE_TIER_SECONDS
+from services.openai_service import evaluate_param_with_rules
+from services.rule_engine import align_verdicts
+
+# Confidence cascade for rule evaluation: every rule group goes to a cheap model first, and only the
+# verdicts it is unsure about (low confidenceScore, "Unknown" or "Error") are re-asked of a strong model.
+# Per-tier latency is in audit_cascade_tier_seconds, per-tier tokens in audit_llm_tokens{caller="cascade_<tier>"}.
+
+CASCADE_ENABLED = os.getenv("CASCADE_ENABLED", "false").lower() == "true"
+CASCADE_CHEAP_MODEL = os.getenv("CASCADE_CHEAP_MODEL", "gpt-4o-mini")  # "local" = the llama.cpp backend
+CASCADE_STRONG_MODEL = os.getenv("CASCADE_STRONG_MODEL", "gpt-4o")
+CASCADE_MIN_CONFIDENCE = float(os.getenv("CASCADE_MIN_CONFIDENCE", "0.8"))
+# The local prompt returns no confidence; its Yes/No verdicts are scored with this instead. It defaults below
+# CASCADE_MIN_CONFIDENCE, so the strong model rechecks them unless the local model is explicitly trusted.
+CASCADE_LOCAL_CONFIDENCE = float(os.getenv("CASCADE_LOCAL_CONFIDENCE", "0.7"))
+
+LOCAL_MODEL = "local"
+ESCALATED_RESULTS = {"Unknown", "Error"}
+
+
+def needs_escalation(verdict: Optional[Dict]) -> bool:
+    if verdict is None or verdict.get("result") in ESCALATED_RESULTS:
+        return True
+    return float(verdict.get("confidenceScore") or 0.0) < CASCADE_MIN_CONFIDENCE
+
+
+async def evaluate_param_locally(transcript: str, param) -> Dict:
+    from services.llm_service import evaluate_rules_with_local_llm  # loads the GGUF model on first use
+
+    rules = [getattr(r, "rule", r).strip() for r in param.ruleList]
+    parsed = await asyncio.to_thread(evaluate_rules_with_local_llm, transcript, rules)
+    return local_verdicts(param, rules, parsed)
+
+
+def local_verdicts(param, rules: List[str], parsed) -> Dict:
+    """The local model's answers in the evaluate_param_with_rules shape."""
+    verdicts = []
+    # The local prompt carries no rule ids, so its answers are matched by position
+    for i, item in enumerate(param.ruleList):
+        answer = parsed[i] if i < len(parsed) and isinstance(parsed[i], dict) else {}
+        result = answer.get("result", "Error")
+        verdicts.append({
+            "ruleId": getattr(item, "ruleId", None),
+            "rule": rules[i],
+            "result": result,
+            "reason": answer.get("reason", "Rule missing from model response"),
+            "confidenceScore": CASCADE_LOCAL_CONFIDENCE if result in ("Yes", "No") else 0.0
+        })
+    return {"id": param.id, "name": param.name, "rules": verdicts}
+
+
+async def evaluate_tier(tier: str, model: str, transcript: str, param) -> Dict:
+    started = time.perf_counter()
+    try:
+        if model == LOCAL_MODEL:
+            return await evaluate_param_locally(transcript, param)
+        return await evaluate_param_with_rules(transcript, param, model=model, caller=f"cascade_{tier}")
+    finally:
+        CASCADE_TIER_SECONDS.observe(time.perf_counter() - started, tier=tier, model=model)
+
+
+async def evaluate_param_cascade(transcript: str, param) -> Dict:
+    """
+    evaluate_param_with_rules through the cascade. Returns the same shape, one verdict per rule in rule order.
+    """
+    cheap = await evaluate_tier("cheap", CASCADE_CHEAP_MODEL, transcript, param)
+    verdicts = align_verdicts(param.ruleList, cheap["rules"])
+
+    escalated = [i for i, verdict in enumerate(verdicts) if needs_escalation(verdict)]
+    CASCADE_RULES.inc(len(verdicts) - len(escalated), tier="cheap")
+    if escalated:
+        subset = ParameterRule(id=param.id, name=param.name, ruleList=[param.ruleList[i] for i in escalated])
+        strong = await evaluate_tier("strong", CASCADE_STRONG_MODEL, transcript, subset)
+        for i, verdict in zip(escalated, align_verdicts(subset.ruleList, strong["rules"])):
+            if verdict is None or verdict.get("result") == "Error":
+                CASCADE_ESCALATIONS.inc(outcome="failed")
+                if verdicts[i] is not None:
+                    CASCADE_RULES.inc(tier="cheap")
+                    continue
+            else:
+                previous = verdicts[i].get("result") if verdicts[i] else None
+                CASCADE_ESCALATIONS.inc(outcome="agreed" if verdict.get("result") == previous else "changed")
+            CASCADE_RULES.inc(tier="strong")
+            verdicts[i] = verdict
+
+    rules = []
+    for item, verdict in zip(param.ruleList, verdicts):
+        rules.append(verdict or {
+            "ruleId": getattr(item, "ruleId", None),
+            "rule": getattr(item, "rule", item),
+            "result": "Error",
+            "reason": "Rule missing from model response",
+            "confidenceScore": 0.0
+        })
+    return {"id": param.id, "name": param.name, "rules": rules}
+
+
+async def evaluate_param(transcript: str, param) -> Dict:
+    """Rule-group evaluation used by the audit pipeline: the cascade when CASCADE_ENABLED, else one model."""
+    if CASCADE_ENABLED:
+        return await evaluate_param_cascade(transcript, param)
+    return await evaluate_param_with_rules(transcript, param)
@@ -0,0 +1,55 @@
+import hashlib
+import os
+import tempfile
+
+import requests
+
+from services.cancellation import check_cancelled
+from services.metrics_service import DOWNLOAD_BYTES, DOWNLOAD_SECONDS
+from services.preflight_service import AUDIO_TOO_LARGE, MAX_AUDIO_BYTES, reject
+
+
+def download_audio(audio_url: str) -> str:
+    """
+    Streams the audio at audio_url into a temp file and returns its path.
+    Stops between chunks if the audit is abandoned.
+    """
+    with DOWNLOAD_SECONDS.time():
+        response = requests.get(audio_url, stream=True)
+        if response.status_code != 200:
+            raise RuntimeError(f"Failed to download audio (HTTP {response.status_code})")
+
+        ext = os.path.splitext(audio_url)[-1]
+        with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp:
+            # Enforce the size limit while streaming; Content-Length can be missing or wrong
+            try:
+                for chunk in iter(lambda: response.raw.read(1 << 20), b""):
+                    check_cancelled()
+                    tmp.write(chunk)
+                    if tmp.tell() > MAX_AUDIO_BYTES:
+                        raise reject(AUDIO_TOO_LARGE, f"Audio exceeds the {MAX_AUDIO_BYTES / 1048576:.0f} MB limit")
+            except BaseException:
+                # Cancelled, rejected, or the connection or disk failed: the partial file is never returned
+                response.close()
+                tmp.close()
+                remove_temp_files(tmp.name)
+                raise
+            DOWNLOAD_BYTES.observe(tmp.tell())
+            return tmp.name
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def remove_temp_files(*paths) -> None:
+    for path in paths:
+        try:
+            if path and os.path.exists(path):
+                os.remove(path)
+        except Exception as e:
+            print(f"Failed to remove temp file {path}: {e}")
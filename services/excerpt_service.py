@@ -0,0 +1,151 @@
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from services.metrics_service import EXCERPT_FALLBACKS, EXCERPT_RATIO
+from services.transcript_ingest import parse_transcript
+from services.transcript_service import seconds_to_timestamp
+
+# Retrieval-based excerpting: instead of sending the whole call with every rule group, index the
+# transcript once (BM25 over short windows of consecutive segments, all local) and send only the
+# windows relevant to the group's rules. Anything the index can't answer confidently gets the full transcript.
+
+TRANSCRIPT_EXCERPTS = os.getenv("TRANSCRIPT_EXCERPTS", "false").lower() == "true"
+EXCERPT_TOP_K = int(os.getenv("EXCERPT_TOP_K", "3"))                      # windows per rule
+EXCERPT_WINDOW_SEGMENTS = int(os.getenv("EXCERPT_WINDOW_SEGMENTS", "3"))  # segments per indexed window
+EXCERPT_CONTEXT_SEGMENTS = int(os.getenv("EXCERPT_CONTEXT_SEGMENTS", "1"))
+EXCERPT_MIN_COVERAGE = float(os.getenv("EXCERPT_MIN_COVERAGE", "0.5"))    # share of rule terms found in the call
+EXCERPT_MIN_TRANSCRIPT_CHARS = int(os.getenv("EXCERPT_MIN_TRANSCRIPT_CHARS", "6000"))
+EXCERPT_MAX_RATIO = float(os.getenv("EXCERPT_MAX_RATIO", "0.5"))          # larger excerpts aren't worth the recall risk
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9áéíóúñü']+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "did", "do", "does", "for", "from", "has", "have", "he",
+    "her", "his", "if", "in", "is", "it", "its", "of", "on", "or", "she", "that", "the", "their", "them", "they",
+    "this", "to", "was", "were", "whether", "which", "who", "will", "with", "you", "your", "should", "must",
+    # words every rule uses but that say nothing about where in the call to look
+    "agent", "customer", "caller", "call", "representative", "rep", "during",
+}
+
+
+def _stem(token: str) -> str:
+    for suffix in ("ing", "ed", "es", "s"):
+        if len(token) > len(suffix) + 2 and token.endswith(suffix):
+            return token[: -len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [_stem(t) for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def as_segments(transcript: Union[str, List[Dict]]) -> List[Dict]:
+    """
+    Whisper segments pass through; a plain-text transcript is parsed (timestamps, SRT/VTT, JSON or sentences).
+    """
+    if isinstance(transcript, str):
+        return parse_transcript(transcript)
+    return transcript
+
+
+class TranscriptIndex:
+    """BM25 index over overlapping windows of EXCERPT_WINDOW_SEGMENTS consecutive segments."""
+
+    def __init__(self, segments: List[Dict], window: int = EXCERPT_WINDOW_SEGMENTS):
+        self.segments = segments
+        self.window = max(1, window)
+        self.total_chars = sum(len(s["text"]) for s in segments)
+
+        starts = range(max(1, len(segments) - self.window + 1))
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}  # term -> [(window, term frequency)]
+        self.lengths: List[int] = []
+        for w in starts:
+            counts = Counter(t for s in segments[w:w + self.window] for t in tokenize(s["text"]))
+            self.lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, []).append((w, tf))
+
+        n = len(self.lengths)
+        self.avg_length = (sum(self.lengths) / n) if n else 1.0
+        self.idf = {t: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for t, p in self.postings.items()}
+
+    def coverage(self, terms: Sequence[str]) -> float:
+        unique = set(terms)
+        return sum(1 for t in unique if t in self.postings) / len(unique) if unique else 0.0
+
+    def top_windows(self, terms: Sequence[str], k: int) -> List[int]:
+        scores: Dict[int, float] = {}
+        for term in set(terms):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for w, tf in self.postings[term]:
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[w] / (self.avg_length or 1.0))
+                scores[w] = scores.get(w, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+        return [w for w, _ in sorted(scores.items(), key=lambda kv: -kv[1])[:k]]
+
+    def excerpt(self, rules: Sequence[str], k: int = EXCERPT_TOP_K) -> Optional[str]:
+        """
+        Returns the transcript lines relevant to any of the rules, in call order, or None when the
+        full transcript should be used instead.
+        """
+        if self.total_chars < EXCERPT_MIN_TRANSCRIPT_CHARS:
+            EXCERPT_FALLBACKS.inc(reason="short_transcript")
+            return None
+
+        selected = set()
+        for rule in rules:
+            terms = tokenize(rule)
+            if self.coverage(terms) < EXCERPT_MIN_COVERAGE:
+                EXCERPT_FALLBACKS.inc(reason="low_coverage")
+                return None
+            for w in self.top_windows(terms, k):
+                first = max(0, w - EXCERPT_CONTEXT_SEGMENTS)
+                last = min(len(self.segments), w + self.window + EXCERPT_CONTEXT_SEGMENTS)
+                selected.update(range(first, last))
+
+        if not selected:
+            EXCERPT_FALLBACKS.inc(reason="no_match")
+            return None
+
+        lines, previous = [], None
+        for i in sorted(selected):
+            if previous is not None and i != previous + 1:
+                lines.append("...")
+            seg = self.segments[i]
+            stamp = f"[{seconds_to_timestamp(seg['start'])}] " if seg.get("start") is not None else ""
+            lines.append(f"{stamp}{seg['text'].strip()}")
+            previous = i
+        text = "\n".join(lines)
+
+        ratio = len(text) / self.total_chars
+        if ratio > EXCERPT_MAX_RATIO:
+            EXCERPT_FALLBACKS.inc(reason="no_savings")
+            return None
+        EXCERPT_RATIO.observe(ratio)
+        return text
+
+
+def build_transcript_index(transcript: Union[str, List[Dict]], enabled: Optional[bool] = None) -> Optional[TranscriptIndex]:
+    """
+    Builds the per-audit index when excerpting is on (request flag, else TRANSCRIPT_EXCERPTS).
+    """
+    if not (TRANSCRIPT_EXCERPTS if enabled is None else enabled):
+        return None
+    segments = as_segments(transcript)
+    return TranscriptIndex(segments) if segments else None
+
+
+def transcript_for_rules(index: Optional[TranscriptIndex], full_text: str, rules: Sequence[str]) -> str:
+    """
+    The transcript to send with a rule group: its excerpt when retrieval is confident, else the full text.
+    """
+    if index is None:
+        return full_text
+    excerpt = index.excerpt(rules)
+    return excerpt if excerpt is not None else full_text
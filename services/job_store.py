@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "./data/jobs.sqlite3")
+# Finished jobs older than this are deleted with their evaluations; 0 keeps them forever
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "168"))
+JOB_PRUNE_INTERVAL_SECONDS = float(os.getenv("JOB_PRUNE_INTERVAL_SECONDS", "600"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id          TEXT PRIMARY KEY,
+    kind            TEXT NOT NULL,
+    request_json    TEXT NOT NULL,
+    status          TEXT NOT NULL,
+    stage           TEXT,
+    owner           TEXT,
+    transcript_json TEXT,
+    result_json     TEXT,
+    webhook_status  TEXT,
+    error           TEXT,
+    created_at      REAL NOT NULL,
+    updated_at      REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS evaluations (
+    job_id          TEXT NOT NULL,
+    param_key       TEXT NOT NULL,
+    evaluation_json TEXT NOT NULL,
+    PRIMARY KEY (job_id, param_key)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+CREATE INDEX IF NOT EXISTS jobs_updated_at ON jobs (updated_at);
+"""
+
+UNFINISHED_STATUSES = ("queued", "running")
+
+
+@dataclass
+class JobRecord:
+    job_id: str
+    kind: str
+    request: Dict
+    status: str
+    stage: Optional[str]
+    owner: Optional[str]
+    transcript: Any
+    result: Optional[Dict]
+    webhook_status: Optional[str]
+    error: Optional[str]
+
+
+def derive_job_id(kind: str, request, idempotency_key: Optional[str] = None) -> str:
+    """
+    Uses the client's Idempotency-Key when given. Otherwise the key is the sampleId/audioFileId plus a
+    hash of the full request, so a retry resumes while a re-audit with different rules starts fresh.
+    """
+    if idempotency_key:
+        return f"{kind}:{idempotency_key}"
+    body = json.dumps(jsonable_encoder(request), sort_keys=True)
+    digest = hashlib.sha256(body.encode()).hexdigest()[:24]
+    ident = request.sampleId or request.audioFileId or "anon"
+    return f"{kind}:{ident}:{digest}"
+
+
+def _owner_alive(owner: Optional[str]) -> bool:
+    if not owner:
+        return False
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname():
+        return True  # cannot tell for another host; leave it alone
+    try:
+        os.kill(int(pid), 0)
+        return True
+    except (OSError, ValueError):
+        return False
+
+
+class JobStore:
+    """
+    Local SQLite record of every audit job and its per-stage artifacts (transcript,
+    per-parameter evaluations, final payload and webhook delivery status).
+    """
+
+    def __init__(self, path: str, retention_seconds: float = JOB_RETENTION_HOURS * 3600):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self.retention_seconds = retention_seconds
+        self._next_prune = 0.0
+        self.prune_finished()
+
+    def _execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def _row_to_record(self, row) -> JobRecord:
+        return JobRecord(
+            job_id=row[0],
+            kind=row[1],
+            request=json.loads(row[2]),
+            status=row[3],
+            stage=row[4],
+            owner=row[5],
+            transcript=json.loads(row[6]) if row[6] is not None else None,
+            result=json.loads(row[7]) if row[7] is not None else None,
+            webhook_status=row[8],
+            error=row[9],
+        )
+
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        row = self._execute(
+            "SELECT job_id, kind, request_json, status, stage, owner, transcript_json, result_json, webhook_status, error "
+            "FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        return self._row_to_record(row) if row else None
+
+    def create_or_get(self, job_id: str, kind: str, request) -> JobRecord:
+        now = time.time()
+        if now >= self._next_prune:
+            self.prune_finished(now)
+        self._execute(
+            "INSERT OR IGNORE INTO jobs (job_id, kind, request_json, status, owner, created_at, updated_at) "
+            "VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+            (job_id, kind, json.dumps(jsonable_encoder(request)), self.owner, now, now)
+        )
+        return self.get(job_id)
+
+    def _update(self, job_id: str, **fields) -> None:
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+
+    def mark_running(self, job_id: str) -> None:
+        self._update(job_id, status="running", owner=self.owner, error=None)
+
+    def save_transcript(self, job_id: str, transcript) -> None:
+        self._update(job_id, transcript_json=json.dumps(transcript), stage="transcribed")
+
+    def save_evaluation(self, job_id: str, param_key: str, evaluation: Dict) -> None:
+        self._execute(
+            "INSERT OR REPLACE INTO evaluations (job_id, param_key, evaluation_json) VALUES (?, ?, ?)",
+            (job_id, param_key, json.dumps(jsonable_encoder(evaluation)))
+        )
+
+    def get_evaluations(self, job_id: str) -> Dict[str, Dict]:
+        rows = self._execute(
+            "SELECT param_key, evaluation_json FROM evaluations WHERE job_id = ?", (job_id,)
+        ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def complete(self, job_id: str, result: Dict) -> None:
+        self._update(job_id, status="completed", stage="evaluated", result_json=json.dumps(jsonable_encoder(result)))
+
+    def fail(self, job_id: str, error: str) -> None:
+        self._update(job_id, status="error", error=error)
+
+    def set_webhook_status(self, job_id: str, webhook_status: str) -> None:
+        self._update(job_id, webhook_status=webhook_status)
+
+    def prune_finished(self, now: Optional[float] = None) -> int:
+        """
+        Deletes completed and failed jobs (and their evaluations) not updated within the retention age.
+        Completed jobs whose webhook is still pending are kept so recovery can deliver it.
+        """
+        now = time.time() if now is None else now
+        self._next_prune = now + JOB_PRUNE_INTERVAL_SECONDS
+        if self.retention_seconds <= 0:
+            return 0
+        cutoff = now - self.retention_seconds
+        finished = (
+            "status = 'error' OR (status = 'completed' AND webhook_status IS NOT 'pending')"
+        )
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    f"DELETE FROM evaluations WHERE job_id IN "
+                    f"(SELECT job_id FROM jobs WHERE updated_at < ? AND ({finished}))", (cutoff,)
+                )
+                pruned = self._conn.execute(
+                    f"DELETE FROM jobs WHERE updated_at < ? AND ({finished})", (cutoff,)
+                ).rowcount
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if pruned:
+            print(f"[JobStore] Pruned {pruned} finished jobs older than {self.retention_seconds / 3600:g}h")
+        return pruned
+
+    def claim_orphaned_jobs(self) -> List[JobRecord]:
+        """
+        Claims unfinished jobs whose owning process is gone (crash or restart) for this process,
+        plus completed jobs whose webhook was never delivered.
+        """
+        rows = self._execute(
+            "SELECT job_id, owner FROM jobs WHERE status IN (?, ?) "
+            "OR (status = 'completed' AND webhook_status = 'pending')",
+            UNFINISHED_STATUSES
+        ).fetchall()
+
+        claimed = []
+        for job_id, owner in rows:
+            if owner == self.owner or _owner_alive(owner):
+                continue
+            cursor = self._execute(
+                "UPDATE jobs SET owner = ?, updated_at = ? WHERE job_id = ? AND owner IS ?",
+                (self.owner, time.time(), job_id, owner)
+            )
+            if cursor.rowcount == 1:
+                claimed.append(self.get(job_id))
+        return claimed
+
+
+job_store = JobStore(JOB_STORE_PATH)
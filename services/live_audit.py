@@ -0,0 +1,355 @@
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+import wave
+from collections import deque
+from contextlib import nullcontext
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from dtos.audit_models import LiveAuditStart, ParameterRule
+from services.admission_service import admission_controller
+from services.audio_format_handler import transcode_to_whisper_wav
+from services.audit_pipeline import evaluate_rules, run_in_thread
+from services.cascade_service import evaluate_param
+from services.download_service import remove_temp_files
+from services.excerpt_service import build_transcript_index, tokenize
+from services.metrics_service import LIVE_DROPPED_AUDIO_SECONDS, LIVE_SESSIONS, LIVE_WINDOW_LATENCY
+from services.rule_engine import align_verdicts, split_local_rules
+from services.transcript_ingest import render_segments
+from services.transcription_profiles import resolve_transcription_profile
+from services.transcription_workers import transcribe_audio
+
+# Live-call auditing. Audio frames arriving on a WebSocket are only buffered; once LIVE_WINDOW_SECONDS
+# have accumulated, the window is cut at its quietest point and transcribed by a background task (through
+# the same transcription workers and admission control as recorded audio). Rules whose terms occur in the
+# new segments are re-evaluated against the recent transcript while the next window is transcribed.
+# Memory per session is bounded: pending audio by LIVE_MAX_BACKLOG_SECONDS (older windows are dropped when
+# transcription falls behind), each frame by LIVE_MAX_FRAME_BYTES and the retained transcript by
+# LIVE_MAX_TRANSCRIPT_CHARS.
+
+LIVE_WINDOW_SECONDS = float(os.getenv("LIVE_WINDOW_SECONDS", "10"))
+LIVE_MAX_BACKLOG_SECONDS = float(os.getenv("LIVE_MAX_BACKLOG_SECONDS", "60"))
+LIVE_CONTEXT_CHARS = int(os.getenv("LIVE_CONTEXT_CHARS", "12000"))  # transcript sent with interim evaluations
+LIVE_MAX_TRANSCRIPT_CHARS = int(os.getenv("LIVE_MAX_TRANSCRIPT_CHARS", "200000"))
+LIVE_MAX_FRAME_BYTES = int(os.getenv("LIVE_MAX_FRAME_BYTES", "65536"))
+CUT_SEARCH_SECONDS = 2.0  # look for a pause in the last seconds of a window, so cuts rarely split a word
+
+ENCODINGS = {"pcm_s16le", "mulaw"}
+DEFINITE_RESULTS = {"Yes", "No"}
+
+
+def _mulaw_sample(byte: int) -> int:
+    byte = ~byte & 0xFF
+    exponent, mantissa = (byte >> 4) & 0x07, byte & 0x0F
+    magnitude = (((mantissa << 3) + 0x84) << exponent) - 0x84
+    return -magnitude if byte & 0x80 else magnitude
+
+
+_MULAW_PCM = [_mulaw_sample(b).to_bytes(2, "little", signed=True) for b in range(256)]
+
+
+def mulaw_to_pcm16(data: bytes) -> bytes:
+    """G.711 μ-law to 16-bit little-endian PCM."""
+    return b"".join([_MULAW_PCM[b] for b in data])
+
+
+def quiet_cut(pcm: bytes, sample_rate: int) -> int:
+    """
+    Byte offset in the middle of the quietest 100 ms of the last CUT_SEARCH_SECONDS of pcm.
+    Runs on the event loop for every window, so the energy scan is vectorised rather than a per-sample loop.
+    """
+    search = min(len(pcm), int(CUT_SEARCH_SECONDS * sample_rate) * 2)
+    base = len(pcm) - search
+    samples = np.frombuffer(pcm, dtype="<i2", offset=base).astype(np.int64)
+    step = max(1, sample_rate // 10)
+    steps = len(samples) // step
+    if not steps:
+        return len(pcm)
+    energy = np.square(samples[:steps * step]).reshape(steps, step).sum(axis=1)
+    return base + (int(np.argmin(energy)) * step + step // 2) * 2
+
+
+def write_wav(path: str, pcm: bytes, sample_rate: int) -> None:
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm)
+
+
+def _no_stage(name: str):
+    return nullcontext()
+
+
+class LiveAuditSession:
+    """
+    One live call. feed() does constant work per frame; transcription and evaluation run in background
+    tasks and report through `send` as {"type": "transcript" | "verdicts" | "lagging" | "error" | "final", ...}.
+    """
+
+    def __init__(self, start: LiveAuditStart, send: Callable[[Dict], Awaitable]):
+        if start.encoding not in ENCODINGS:
+            raise ValueError(f"Unsupported encoding '{start.encoding}', expected one of {sorted(ENCODINGS)}")
+        if not 8000 <= start.sampleRate <= 48000:
+            raise ValueError("sampleRate must be between 8000 and 48000")
+        self.model_size = resolve_transcription_profile(start.transcriptionProfile)["model"]
+
+        self.start = start
+        self.send = send
+        self.session_id = start.sessionId or str(uuid.uuid4())
+        self.bytes_per_second = start.sampleRate * 2
+
+        self.buffer = bytearray()
+        self.buffer_offset = 0.0  # call time at the start of self.buffer
+        self.windows: Deque[Tuple[float, bytes, float]] = deque()  # (call time, pcm, perf_counter when cut)
+        self.backlog_seconds = 0.0
+        self.dropped_seconds = 0.0
+        self.dropped_reported = 0.0
+        self.wakeup = asyncio.Event()
+        self.closing = False
+
+        self.segments: Deque[Dict] = deque()
+        self.transcript_chars = 0
+        self.pending_terms: Set[str] = set()
+        self.verdicts: Dict[Tuple[int, int], Dict] = {}  # (parameter index, rule index) -> latest verdict
+        self.rule_terms = {
+            (p, r): set(tokenize(getattr(rule, "rule", rule)))
+            for p, param in enumerate(start.parameter)
+            for r, rule in enumerate(param.ruleList)
+        }
+
+        self.transcribing: Optional[asyncio.Task] = None
+        self.evaluating: Optional[asyncio.Task] = None
+
+    # <------- Frames ------->
+
+    def begin(self) -> None:
+        LIVE_SESSIONS.inc()
+        self.transcribing = asyncio.create_task(self._transcribe_loop())
+
+    def feed(self, frame: bytes) -> None:
+        """Buffers one frame, queueing every full window it completes. Raises ValueError for an oversize frame."""
+        if len(frame) > LIVE_MAX_FRAME_BYTES:
+            raise ValueError(f"Frame of {len(frame)} bytes exceeds LIVE_MAX_FRAME_BYTES ({LIVE_MAX_FRAME_BYTES})")
+        self.buffer += mulaw_to_pcm16(frame) if self.start.encoding == "mulaw" else frame
+        window_bytes = max(2, int(LIVE_WINDOW_SECONDS * self.bytes_per_second) & ~1)
+        while len(self.buffer) >= window_bytes:
+            cut = quiet_cut(bytes(self.buffer[:window_bytes]), self.start.sampleRate) or window_bytes
+            self._enqueue(bytes(self.buffer[:cut]))
+            del self.buffer[:cut]
+
+    def _enqueue(self, pcm: bytes) -> None:
+        seconds = len(pcm) / self.bytes_per_second
+        self.windows.append((self.buffer_offset, pcm, time.perf_counter()))
+        self.buffer_offset += seconds
+        self.backlog_seconds += seconds
+        # Transcription is behind: drop the oldest audio rather than grow without bound
+        while self.backlog_seconds > LIVE_MAX_BACKLOG_SECONDS and len(self.windows) > 1:
+            _, dropped, _ = self.windows.popleft()
+            lost = len(dropped) / self.bytes_per_second
+            self.backlog_seconds -= lost
+            self.dropped_seconds += lost
+            LIVE_DROPPED_AUDIO_SECONDS.inc(lost)
+        self.wakeup.set()
+
+    # <------- Transcription ------->
+
+    async def _transcribe_loop(self) -> None:
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            while self.windows:
+                offset, pcm, cut_at = self.windows.popleft()
+                self.backlog_seconds -= len(pcm) / self.bytes_per_second
+                await self._process_window(offset, pcm)
+                LIVE_WINDOW_LATENCY.observe(time.perf_counter() - cut_at)
+            if self.closing:
+                return
+
+    async def _process_window(self, offset: float, pcm: bytes) -> None:
+        if self.dropped_seconds > self.dropped_reported:
+            self.dropped_reported = self.dropped_seconds
+            await self.push({"type": "lagging", "droppedSeconds": round(self.dropped_seconds, 1)})
+        try:
+            segments = await self._transcribe(offset, pcm)
+        except Exception as e:
+            print(f"[Live {self.session_id}] Window at {offset:.1f}s failed: {e}")
+            await self.push({"type": "error", "callSeconds": round(offset, 1), "error": str(e)})
+            return
+        if not segments:
+            return
+
+        self.segments.extend(segments)
+        self.transcript_chars += sum(len(seg["text"]) for seg in segments)
+        while self.transcript_chars > LIVE_MAX_TRANSCRIPT_CHARS and len(self.segments) > 1:
+            self.transcript_chars -= len(self.segments.popleft()["text"])
+        await self.push({"type": "transcript", "segments": segments})
+
+        self.pending_terms.update(t for seg in segments for t in tokenize(seg["text"]))
+        if self.evaluating is None or self.evaluating.done():
+            self.evaluating = asyncio.create_task(self._evaluate_loop())
+
+    async def _transcribe(self, offset: float, pcm: bytes) -> List[Dict]:
+        path = os.path.join(tempfile.gettempdir(), f"live-{uuid.uuid4()}.wav")
+        transcoded = None
+        try:
+            await run_in_thread("live_write", write_wav, path, pcm, self.start.sampleRate)
+            ticket = admission_controller.estimate(len(pcm) / self.bytes_per_second, 0, model_size=self.model_size)
+            async with admission_controller.admit(ticket):
+                transcoded = await run_in_thread("transcode", transcode_to_whisper_wav, path)
+                segments = await run_in_thread(
+                    "transcribe", transcribe_audio, transcoded, self.start.transcriptionProfile, self.start.language
+                )
+        finally:
+            remove_temp_files(path, transcoded if transcoded != path else None)
+        return [
+            {"start": round(offset + (seg.get("start") or 0.0), 2), "text": seg["text"].strip()}
+            for seg in segments if seg["text"].strip()
+        ]
+
+    # <------- Evaluation ------->
+
+    async def _evaluate_loop(self) -> None:
+        """At most one evaluation in flight; terms heard meanwhile are handled by the next round."""
+        while self.pending_terms:
+            terms, self.pending_terms = self.pending_terms, set()
+            try:
+                await self._evaluate_affected(terms)
+            except Exception as e:
+                print(f"[Live {self.session_id}] Evaluation failed: {e}")
+                await self.push({"type": "error", "error": f"Evaluation failed: {e}"})
+
+    def _context(self) -> List[Dict]:
+        context, chars = [], 0
+        for seg in reversed(self.segments):
+            chars += len(seg["text"])
+            if chars > LIVE_CONTEXT_CHARS and context:
+                break
+            context.append(seg)
+        return context[::-1]
+
+    def _update(self, key: Tuple[int, int], verdict: Optional[Dict]) -> bool:
+        previous = self.verdicts.get(key)
+        if verdict is None:
+            return False
+        if previous is not None:
+            # Only part of the call is retained, so "Unknown" may just mean the evidence has scrolled out
+            if previous.get("result") in DEFINITE_RESULTS and verdict.get("result") not in DEFINITE_RESULTS:
+                return False
+            if (previous.get("result"), previous.get("reason")) == (verdict.get("result"), verdict.get("reason")):
+                return False
+        self.verdicts[key] = verdict
+        return True
+
+    async def _evaluate_affected(self, terms: Set[str]) -> None:
+        segments = list(self.segments)
+        context = self._context()
+        context_text = render_segments(context)
+        changed = []
+        jobs = []
+        for p, param in enumerate(self.start.parameter):
+            # Matchers are cheap enough to re-run over everything retained
+            local, _ = await run_in_thread("match", split_local_rules, segments, param.ruleList)
+            changed.extend((p, i) for i, verdict in local.items() if self._update((p, i), verdict))
+            affected = [
+                i for i in range(len(param.ruleList))
+                if i not in local and self.rule_terms[(p, i)] & terms
+            ]
+            if affected:
+                jobs.append((p, affected))
+
+        if jobs:
+            ticket = admission_controller.estimate(
+                0.0, sum(len(positions) for _, positions in jobs), transcript_chars=len(context_text)
+            )
+            async with admission_controller.admit(ticket):
+                results = await asyncio.gather(*[
+                    evaluate_param(context_text, self._subset(p, positions)) for p, positions in jobs
+                ])
+            for (p, positions), result in zip(jobs, results):
+                rules = [self.start.parameter[p].ruleList[i] for i in positions]
+                for i, verdict in zip(positions, align_verdicts(rules, result["rules"])):
+                    if self._update((p, i), verdict):
+                        changed.append((p, i))
+
+        if changed:
+            await self.push({"type": "verdicts", "rules": [self._described(key) for key in changed]})
+
+    def _subset(self, p: int, positions: List[int]) -> ParameterRule:
+        param = self.start.parameter[p]
+        return ParameterRule(id=param.id, name=param.name, ruleList=[param.ruleList[i] for i in positions])
+
+    def _described(self, key: Tuple[int, int]) -> Dict:
+        param = self.start.parameter[key[0]]
+        return {"parameterId": param.id, "parameterName": param.name, "ruleIndex": key[1], **self.verdicts[key]}
+
+    async def _evaluate_final(self) -> List[Dict]:
+        """Every rule against the retained transcript, as a recorded audit would evaluate it."""
+        segments = list(self.segments)
+        evaluations = []
+        if segments:
+            excerpt_index = await run_in_thread("excerpt_index", build_transcript_index, segments, None)
+            full_text = render_segments(segments)
+            ticket = admission_controller.estimate(
+                0.0, len(self.rule_terms), transcript_chars=self.transcript_chars
+            )
+            async with admission_controller.admit(ticket):
+                results = await asyncio.gather(*[
+                    evaluate_rules(param, segments, excerpt_index, full_text, _no_stage)
+                    for param in self.start.parameter
+                ])
+            for p, (param, result) in enumerate(zip(self.start.parameter, results)):
+                for i, verdict in enumerate(align_verdicts(param.ruleList, result["rules"])):
+                    self._update((p, i), verdict)
+
+        for p, param in enumerate(self.start.parameter):
+            evaluations.append({"id": param.id, "name": param.name, "rules": [
+                self.verdicts.get((p, i)) or {
+                    "ruleId": getattr(rule, "ruleId", None),
+                    "rule": getattr(rule, "rule", rule),
+                    "result": "Unknown",
+                    "reason": "No speech was transcribed",
+                    "confidenceScore": 0.0
+                }
+                for i, rule in enumerate(param.ruleList)
+            ]})
+        return evaluations
+
+    # <------- Lifecycle ------->
+
+    async def finish(self) -> None:
+        """End of call: transcribe the remaining audio, wait for pending work and push the final verdicts."""
+        if len(self.buffer) >= self.bytes_per_second // 2:
+            self._enqueue(bytes(self.buffer))
+        self.buffer.clear()
+        self.closing = True
+        self.wakeup.set()
+        await self.transcribing
+        if self.evaluating is not None:
+            await self.evaluating
+        evaluations = await self._evaluate_final()
+        await self.push({
+            "type": "final",
+            "sessionId": self.session_id,
+            "callSeconds": round(self.buffer_offset, 1),
+            "droppedSeconds": round(self.dropped_seconds, 1),
+            "evaluations": evaluations
+        })
+
+    async def close(self) -> None:
+        for task in (self.transcribing, self.evaluating):
+            if task is not None and not task.done():
+                task.cancel()
+        if self.transcribing is not None:
+            LIVE_SESSIONS.dec()
+        self.transcribing = self.evaluating = None
+
+    async def push(self, message: Dict) -> None:
+        try:
+            await self.send(message)
+        except Exception as e:
+            print(f"[Live {self.session_id}] Could not send {message.get('type')}: {e}")
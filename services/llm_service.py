@@ -1,7 +1,10 @@
 from typing import List
 import json
+import time
 from llama_cpp import Llama
 
+from services.metrics_service import record_llm_usage
+
 def build_gpt_prompt(transcript: str, rule_list: list[str]) -> str:
     formatted_rules = "\n".join([f"{i+1}. {rule}" for i, rule in enumerate(rule_list)])
 
@@ -52,6 +55,7 @@ def evaluate_rules_with_local_llm(transcript: str, rules: List[str]) -> List[dic
     prompt = build_gpt_prompt(transcript, rules)
 
     def call_llm():
+        started = time.perf_counter()
         try:
             stream_response = llm.create_chat_completion(
                 messages=[
@@ -70,8 +74,11 @@ def evaluate_rules_with_local_llm(transcript: str, rules: List[str]) -> List[dic
                     if 'content' in delta:
                         output_chunks.append(delta['content'])
 
+            # Each streamed chunk carries one token
+            record_llm_usage("rules_local", "llama-cpp", started, "ok", completion_tokens=len(output_chunks))
             return ''.join(output_chunks).strip()
         except Exception as e:
+            record_llm_usage("rules_local", "llama-cpp", started, "error")
             raise RuntimeError(f"LLM call failed: {str(e)}")
 
     # First attempt
@@ -0,0 +1,252 @@
+import functools
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Small in-process Prometheus registry. Updates are a dict lookup and an add under a lock,
+# so instrumenting the hot path costs well under a microsecond per observation.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+RATIO_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 4.0)
+BYTES_BUCKETS = (16e3, 64e3, 256e3, 1e6, 4e6, 16e6, 64e6, 256e6, 1e9)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+_REGISTRY: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """Gauge whose value is either set directly or read from a callback at scrape time."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), callback: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callback = callback
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def _samples(self) -> List[str]:
+        if self._callback is not None:
+            return [f"{self.name} {self._callback()}"]
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[str, ...], List[float]] = {}  # per-bucket counts, then sum and count
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def timed(self, **labels):
+        """Decorator form of time()."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.time(**labels):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+
+        lines = []
+        for key, state in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', repr(float(bound))))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', '+Inf'))} {state[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {state[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+
+def current_rss_bytes() -> int:
+    """
+    Returns the resident set size of this process. Falls back to the peak RSS where /proc is unavailable.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        return usage if usage > 1 << 32 else usage * 1024
+
+
+def _process_cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _children_cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def render_metrics() -> str:
+    return "\n".join(metric.render() for metric in _REGISTRY) + "\n"
+
+
+# <-------------- Metric catalog ----------->
+
+PROCESS_RSS_BYTES = Gauge("process_resident_memory_bytes", "Resident memory size in bytes.", callback=current_rss_bytes)
+PROCESS_CPU_SECONDS = Gauge("process_cpu_seconds_total", "Total user and system CPU time in seconds.", callback=_process_cpu_seconds)
+CHILDREN_CPU_SECONDS = Gauge("process_children_cpu_seconds_total", "CPU time of reaped subprocesses (ffmpeg/ffprobe).", callback=_children_cpu_seconds)
+
+STAGE_SECONDS = Histogram("audit_stage_seconds", "Wall time of blocking pipeline stages run in worker threads.", ["stage"])
+STAGE_CPU_SECONDS = Counter("audit_stage_cpu_seconds_total", "Thread CPU time spent in blocking pipeline stages.", ["stage"])
+STAGE_RSS_BYTES = Gauge("audit_stage_rss_bytes", "Process RSS observed when a stage last finished.", ["stage"])
+
+REQUEST_SECONDS = Histogram("audit_request_seconds", "End-to-end request latency.", ["endpoint", "status"])
+
+DOWNLOAD_SECONDS = Histogram("audit_download_seconds", "Audio download time.")
+DOWNLOAD_BYTES = Histogram("audit_download_bytes", "Downloaded audio size.", buckets=BYTES_BUCKETS)
+
+PROBE_SECONDS = Histogram("audit_probe_seconds", "ffprobe time.", ["probe"])
+PREFLIGHT_REJECTIONS = Counter("audit_preflight_rejections_total", "Audio rejected before full processing, by error code.", ["code"])
+TRANSCODE_SECONDS = Histogram("audit_transcode_seconds", "ffmpeg transcode time.", ["result"])
+
+TRANSCRIBE_SECONDS = Histogram("audit_transcription_seconds", "Transcription wall time.", ["backend", "model"])
+TRANSCRIBE_RTF = Histogram("audit_transcription_real_time_factor", "Transcription time divided by audio duration.", ["backend", "model"], buckets=RATIO_BUCKETS)
+TRANSCRIBE_AUDIO_SECONDS = Counter("audit_transcription_audio_seconds_total", "Audio seconds transcribed.", ["backend", "model"])
+
+LLM_SECONDS = Histogram("audit_llm_seconds", "LLM call latency.", ["caller", "model", "status"])
+LLM_TOKENS = Histogram("audit_llm_tokens", "Tokens per LLM call.", ["caller", "model", "kind"], buckets=TOKEN_BUCKETS)
+LLM_TOKENS_TOTAL = Counter("audit_llm_tokens_total", "Tokens used across LLM calls.", ["model", "kind"])
+
+QUEUE_WAIT_SECONDS = Histogram("audit_queue_wait_seconds", "Time spent waiting for a queue or concurrency slot.", ["queue"])
+SINGLEFLIGHT_REQUESTS = Counter("audit_singleflight_requests_total", "Coalescable calls by flight and role (leader ran the work, shared awaited it).", ["flight", "result"])
+CACHE_REQUESTS = Counter("audit_cache_requests_total", "Cache lookups by cache and result (hit/miss).", ["cache", "result"])
+
+CASCADE_TIER_SECONDS = Histogram("audit_cascade_tier_seconds", "Latency of one rule-group evaluation per cascade tier.", ["tier", "model"])
+CASCADE_RULES = Counter("audit_cascade_rules_total", "Rules by the cascade tier whose verdict was kept.", ["tier"])
+CASCADE_ESCALATIONS = Counter("audit_cascade_escalations_total", "Escalated rules by whether the strong model changed the verdict.", ["outcome"])
+SPECULATIVE_RULES = Counter("audit_speculative_rules_total", "Draft-transcript verdicts kept or re-evaluated on the accurate transcript.", ["result"])
+SPECULATIVE_SIMILARITY = Histogram("audit_speculative_evidence_similarity", "Token similarity of a rule's evidence between draft and accurate transcripts.", buckets=RATIO_BUCKETS)
+RULE_EVALUATIONS = Counter("audit_rule_evaluations_total", "Rules evaluated, by engine (local matcher or llm).", ["engine"])
+
+EXCERPT_RATIO = Histogram("audit_excerpt_ratio", "Excerpt size divided by full transcript size, per rule group.", buckets=RATIO_BUCKETS)
+EXCERPT_FALLBACKS = Counter("audit_excerpt_fallbacks_total", "Rule groups sent the full transcript instead of an excerpt.", ["reason"])
+
+AUDITS_CANCELLED = Counter("audit_cancelled_total", "Audits abandoned before completion, by reason.", ["reason"])
+WASTED_STAGE_SECONDS = Counter("audit_wasted_stage_seconds_total", "Wall time of blocking stages spent on cancelled audits.", ["stage", "reason"])
+WASTED_CPU_SECONDS = Counter("audit_wasted_cpu_seconds_total", "Thread CPU time spent on cancelled audits.", ["stage", "reason"])
+WASTED_TOKENS = Counter("audit_wasted_tokens_total", "LLM tokens spent on cancelled audits.", ["kind", "reason"])
+
+LIVE_SESSIONS = Gauge("audit_live_sessions", "Open live-call audit sessions.")
+LIVE_WINDOW_LATENCY = Histogram("audit_live_window_seconds", "Time from a live audio window being cut to its results being pushed.")
+LIVE_DROPPED_AUDIO_SECONDS = Counter("audit_live_dropped_audio_seconds_total", "Live audio dropped because processing fell behind.")
+
+WEBHOOK_SECONDS = Histogram("audit_webhook_seconds", "Webhook POST latency.", ["status"])
+
+
+def record_llm_usage(caller: str, model: str, started: float, status: str, prompt_tokens: int = 0, completion_tokens: int = 0) -> None:
+    LLM_SECONDS.observe(time.perf_counter() - started, caller=caller, model=model, status=status)
+    if prompt_tokens or completion_tokens:
+        LLM_TOKENS.observe(prompt_tokens, caller=caller, model=model, kind="prompt")
+        LLM_TOKENS.observe(completion_tokens, caller=caller, model=model, kind="completion")
+        LLM_TOKENS_TOTAL.inc(prompt_tokens, model=model, kind="prompt")
+        LLM_TOKENS_TOTAL.inc(completion_tokens, model=model, kind="completion")
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+# <-------------- Metric catalog end ----------->
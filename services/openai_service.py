@@ -1,4 +1,6 @@
 import asyncio
+import hashlib
+import time
 from typing import Dict, List
 import os, json
 from dotenv import load_dotenv
@@ -6,6 +8,35 @@ from fastapi import logger
 from openai import AsyncOpenAI, OpenAI
 import requests
 
+from services.cancellation import charge_tokens
+from services.metrics_service import record_llm_usage
+from services.singleflight import llm_flight
+
+
+def record_http_usage(caller: str, model: str, started: float, response) -> None:
+    """Records latency and token usage of a raw chat-completions HTTP response."""
+    usage = {}
+    if response.status_code == 200:
+        try:
+            usage = response.json().get("usage") or {}
+        except Exception:
+            pass
+    prompt_tokens, completion_tokens = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    record_llm_usage(
+        caller, model, started, "ok" if response.status_code == 200 else str(response.status_code),
+        prompt_tokens, completion_tokens
+    )
+    charge_tokens(prompt_tokens, completion_tokens)
+
+
+def record_sdk_usage(caller: str, model: str, started: float, response) -> None:
+    """Records latency and token usage of an SDK chat completion."""
+    usage = getattr(response, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    record_llm_usage(caller, model, started, "ok", prompt_tokens, completion_tokens)
+    charge_tokens(prompt_tokens, completion_tokens)
+
 def build_gpt_prompt(transcript: str, rule_list: list[str]) -> str:
     # print("Input rules to GPT:", rule_list)
     formatted_rules = "\n".join([
@@ -73,7 +104,9 @@ def evaluate_rules_with_gpt_using_requests(transcript: str, rules: List[str]) ->
     if project_id:
         headers["OpenAI-Project"] = project_id
 
+    started = time.perf_counter()
     response = requests.post("https://api.openai.com/v1/chat/completions", headers=headers, json=payload)
+    record_http_usage("rules_requests", payload["model"], started, response)
 
     if response.status_code != 200:
         print("API Error:", response.status_code, response.text)
@@ -145,7 +178,9 @@ def evaluate_rules_with_gpt_using_requests_with_confidence(transcript: str, rule
     if project_id:
         headers["OpenAI-Project"] = project_id
 
+    started = time.perf_counter()
     response = requests.post("https://api.openai.com/v1/chat/completions", headers=headers, json=payload)
+    record_http_usage("rules_requests_confidence", payload["model"], started, response)
 
     if response.status_code != 200:
         print("API Error:", response.status_code, response.text)
@@ -237,11 +272,13 @@ def format_transcript_html_with_gpt_using_requests(segments: List[dict]) -> str:
         headers["OpenAI-Project"] = project_id
 
     # Call OpenAI API
+    started = time.perf_counter()
     response = requests.post(
         "https://api.openai.com/v1/chat/completions",
         headers=headers,
         json=payload
     )
+    record_http_usage("transcript_html", payload["model"], started, response)
 
     if response.status_code != 200:
         print("API Error:", response.status_code, response.text)
@@ -263,6 +300,8 @@ client = OpenAI(
 def evaluate_rules_with_gpt_using_sdk_with_confidence(transcript: str, rule_list: List[Dict[str, str]]) -> List[dict]:
     prompt = build_gpt_prompt_with_confidence(transcript, rule_list)
 
+    started = time.perf_counter()
+    response = None
     try:
         response = client.chat.completions.create(
             model="gpt-3.5-turbo",
@@ -272,6 +311,7 @@ def evaluate_rules_with_gpt_using_sdk_with_confidence(transcript: str, rule_list
             temperature=0.1,
             max_tokens=2000
         )
+        record_sdk_usage("rules_sdk", "gpt-3.5-turbo", started, response)
 
         content = response.choices[0].message.content
         parsed = json.loads(content)
@@ -288,6 +328,8 @@ def evaluate_rules_with_gpt_using_sdk_with_confidence(transcript: str, rule_list
 
     except Exception as e:
         print("LLM Evaluation Error:", e)
+        if response is None:  # the call itself failed, not the parsing
+            record_llm_usage("rules_sdk", "gpt-3.5-turbo", started, "error")
         return [{
             "ruleId": rule["ruleId"],
             "rule": rule["rule"],
@@ -305,6 +347,32 @@ async_client = AsyncOpenAI(
     project=os.getenv("OPENAI_PROJECT_ID")
 )
 
+
+async def create_chat_completion_async(caller: str, prompt: str, model: str = "gpt-3.5-turbo", temperature: float = 0.1, max_tokens: int = 2000):
+    """
+    Single-flight chat completion: concurrent calls with the same model, prompt and options share one
+    API request (and are only metered once). Raises on API errors.
+    """
+    key = hashlib.sha256(json.dumps([model, prompt, temperature, max_tokens]).encode()).hexdigest()
+
+    async def call():
+        started = time.perf_counter()
+        try:
+            response = await async_client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+        except Exception:
+            record_llm_usage(caller, model, started, "error")
+            raise
+        record_sdk_usage(caller, model, started, response)
+        return response
+
+    return await llm_flight.do(key, call)
+
+
 async def evaluate_rules_with_gpt_using_sdk_with_confidence_async(
     transcript: str,
     rule_list: List[Dict[str, str]]
@@ -312,12 +380,7 @@ async def evaluate_rules_with_gpt_using_sdk_with_confidence_async(
     prompt = build_gpt_prompt_with_confidence(transcript, rule_list)
 
     try:
-        response = await async_client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1,
-            max_tokens=2000
-        )
+        response = await create_chat_completion_async("rules_sdk_async", prompt)
 
         content = response.choices[0].message.content
         parsed = json.loads(content)
@@ -343,18 +406,13 @@ async def evaluate_rules_with_gpt_using_sdk_with_confidence_async(
         } for rule in rule_list]
     
 
-async def evaluate_param_with_rules(transcript: str, param) -> Dict:
+async def evaluate_param_with_rules(transcript: str, param, model: str = "gpt-3.5-turbo", caller: str = "param_rules") -> Dict:
     rule_list = [{"ruleId": r.ruleId, "rule": r.rule.strip()} for r in param.ruleList]
     rule_map = {r["ruleId"]: r["rule"] for r in rule_list}
     prompt = build_gpt_prompt_with_confidence(transcript, rule_list)
 
     try:
-        response = await async_client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1,
-            max_tokens=2000
-        )
+        response = await create_chat_completion_async(caller, prompt, model=model)
 
         content = response.choices[0].message.content
         parsed = json.loads(content)
@@ -388,4 +446,42 @@ async def evaluate_all_parameters_async(transcript: str, parameters: List) -> Li
     tasks = [evaluate_param_with_rules(transcript, param) for param in parameters]
     return await asyncio.gather(*tasks)
     
+RULES_PER_CALL = int(os.getenv("RULES_PER_CALL", "20"))
+
+
+def pack_rules(rule_list: List[Dict[str, str]], per_call: int = RULES_PER_CALL) -> List[List[Dict[str, str]]]:
+    per_call = max(1, per_call)
+    return [rule_list[i:i + per_call] for i in range(0, len(rule_list), per_call)]
+
+
+async def evaluate_rules_packed_async(transcript: str, rule_list: List[Dict[str, str]]) -> List[dict]:
+    """
+    Evaluates many rules against one transcript. Rules are packed RULES_PER_CALL to a prompt, so the
+    transcript is sent once per pack instead of once per rule, and the packs run concurrently.
+    Returns one verdict per input rule, in input order.
+    """
+    # Positional ids keep the mapping exact even when callers repeat or omit ruleIds
+    indexed = [{"ruleId": str(i), "rule": r["rule"]} for i, r in enumerate(rule_list)]
+    packs = pack_rules(indexed)
+    results = await asyncio.gather(*[
+        evaluate_rules_with_gpt_using_sdk_with_confidence_async(transcript, pack) for pack in packs
+    ])
+
+    by_index = {}
+    for pack, parsed in zip(packs, results):
+        pack_ids = {r["ruleId"] for r in pack}
+        for item in parsed if isinstance(parsed, list) else []:
+            if isinstance(item, dict) and str(item.get("ruleId")) in pack_ids:
+                by_index[str(item["ruleId"])] = item
+
+    verdicts = []
+    for i, rule in enumerate(rule_list):
+        item = by_index.get(str(i), {
+            "result": "Error",
+            "reason": "Rule missing from model response",
+            "confidenceScore": 0.0,
+        })
+        verdicts.append({**item, "ruleId": rule["ruleId"], "rule": rule["rule"]})
+    return verdicts
+
 # <-------------- OpenAI setup using SDK (Async) end ----------->
@@ -0,0 +1,192 @@
+import json
+import os
+import re
+import struct
+import subprocess
+from dataclasses import dataclass
+from typing import Optional
+
+import requests
+
+from services.metrics_service import PREFLIGHT_REJECTIONS, PROBE_SECONDS
+
+# Cheap checks run before the full download/transcode: one ranged GET for the first few KB gives the
+# total size (Content-Range / Content-Length), the container (magic bytes) and, via ffprobe on those
+# bytes, the codec and bitrate from which the duration is estimated.
+
+PREFLIGHT_ENABLED = os.getenv("PREFLIGHT_ENABLED", "true").lower() == "true"
+PREFLIGHT_SNIFF_BYTES = int(os.getenv("PREFLIGHT_SNIFF_BYTES", str(64 * 1024)))
+PREFLIGHT_TIMEOUT_SECONDS = float(os.getenv("PREFLIGHT_TIMEOUT_SECONDS", "10"))
+MAX_AUDIO_BYTES = int(float(os.getenv("MAX_AUDIO_MB", "500")) * 1024 * 1024)
+MAX_AUDIO_SECONDS = float(os.getenv("MAX_AUDIO_SECONDS", str(4 * 3600)))
+
+# Containers whose stream headers may sit at the end of the file (MP4 "moov" atom), so a failed
+# probe of the first bytes proves nothing
+TRAILING_HEADER_CONTAINERS = {"mp4"}
+
+# Error codes carried in failure payloads
+AUDIO_UNREACHABLE = "audio_unreachable"
+AUDIO_EMPTY = "audio_empty"
+AUDIO_TOO_LARGE = "audio_too_large"
+AUDIO_TOO_LONG = "audio_too_long"
+AUDIO_UNSUPPORTED = "audio_unsupported_format"
+AUDIO_CORRUPT = "audio_corrupt"
+
+
+class AudioRejected(Exception):
+    """Raised when audio fails validation; `code` is one of the AUDIO_* error codes."""
+
+    def __init__(self, code: str, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+@dataclass
+class PreflightResult:
+    total_bytes: Optional[int]
+    container: Optional[str]
+    codec: Optional[str]
+    estimated_seconds: Optional[float]
+
+
+def reject(code: str, message: str) -> AudioRejected:
+    PREFLIGHT_REJECTIONS.inc(code=code)
+    return AudioRejected(code, message)
+
+
+def sniff_container(head: bytes) -> Optional[str]:
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "wav"
+    if head[:3] == b"ID3" or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0 and head[1] & 0x06):
+        return "mp3"
+    if len(head) > 1 and head[0] == 0xFF and head[1] & 0xF6 == 0xF0:
+        return "aac"
+    if head[:4] == b"fLaC":
+        return "flac"
+    if head[:4] == b"OggS":
+        return "ogg"
+    if head[4:8] == b"ftyp":
+        return "mp4"
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"
+    if head[:4] == b"FORM" and head[8:12] in (b"AIFF", b"AIFC"):
+        return "aiff"
+    if head[:5] == b"#!AMR":
+        return "amr"
+    return None
+
+
+def wav_seconds(head: bytes, total_bytes: Optional[int]) -> Optional[float]:
+    """Duration from the RIFF header: data chunk size (or the file size) over the byte rate."""
+    position = 12
+    byte_rate = None
+    while position + 8 <= len(head):
+        chunk_id, size = head[position:position + 4], struct.unpack("<I", head[position + 4:position + 8])[0]
+        if chunk_id == b"fmt " and position + 20 <= len(head):
+            byte_rate = struct.unpack("<I", head[position + 16:position + 20])[0]
+        elif chunk_id == b"data" and byte_rate:
+            # Streaming writers leave the size at 0 or 0xFFFFFFFF; fall back to the file size then
+            data_bytes = size if 0 < size < 0xFFFFFFFF else (total_bytes - position - 8 if total_bytes else None)
+            return data_bytes / byte_rate if data_bytes is not None else None
+        position += 8 + size + (size & 1)
+    return None
+
+
+@PROBE_SECONDS.timed(probe="preflight")
+def probe_head(head: bytes) -> Optional[dict]:
+    """
+    ffprobe on the first bytes only. Returns {} when ffprobe finds no audio stream, None when it can't run or times out.
+    """
+    try:
+        result = subprocess.run(
+            [
+                "ffprobe", "-v", "error",
+                "-select_streams", "a:0",
+                "-show_entries", "stream=codec_name,bit_rate:format=format_name,bit_rate",
+                "-of", "json",
+                "-i", "pipe:0"
+            ],
+            input=head,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=PREFLIGHT_TIMEOUT_SECONDS
+        )
+        data = json.loads(result.stdout.decode() or "{}")
+    except subprocess.TimeoutExpired:
+        print("[Preflight] ffprobe timed out, skipping stream checks")
+        return None  # a slow probe says nothing about the audio
+    except ValueError:
+        return {}
+    except OSError as e:
+        print(f"[Preflight] ffprobe unavailable, skipping stream checks: {e}")
+        return None
+    streams = data.get("streams") or []
+    if not streams:
+        return {}
+    fmt = data.get("format") or {}
+    bit_rate = streams[0].get("bit_rate") or fmt.get("bit_rate")
+    return {
+        "codec": streams[0].get("codec_name"),
+        "format": fmt.get("format_name"),
+        "bit_rate": float(bit_rate) if bit_rate and bit_rate != "N/A" else None,
+    }
+
+
+def total_size(response) -> Optional[int]:
+    match = re.match(r"bytes \d+-\d+/(\d+)", response.headers.get("Content-Range", ""))
+    if match:
+        return int(match.group(1))
+    if response.status_code == 200 and response.headers.get("Content-Length"):
+        return int(response.headers["Content-Length"])
+    return None
+
+
+def check_duration(seconds: Optional[float]) -> None:
+    """A known duration (None = unknown) must be above zero and at most MAX_AUDIO_SECONDS."""
+    if seconds is None:
+        return
+    if seconds <= 0:
+        raise reject(AUDIO_EMPTY, "Audio contains no samples")
+    if seconds > MAX_AUDIO_SECONDS:
+        raise reject(AUDIO_TOO_LONG, f"Audio is {seconds:.0f}s long, above the {MAX_AUDIO_SECONDS:.0f}s limit")
+
+
+def preflight_audio(audio_url: str) -> PreflightResult:
+    """
+    Validates the audio at audio_url from its headers and first PREFLIGHT_SNIFF_BYTES bytes.
+    Raises AudioRejected for unreachable, empty, oversize, overlong, unsupported or corrupt audio.
+    """
+    try:
+        response = requests.get(
+            audio_url, headers={"Range": f"bytes=0-{PREFLIGHT_SNIFF_BYTES - 1}"},
+            stream=True, timeout=PREFLIGHT_TIMEOUT_SECONDS
+        )
+    except requests.RequestException as e:
+        raise reject(AUDIO_UNREACHABLE, f"Audio URL unreachable: {e}")
+
+    with response:
+        if response.status_code not in (200, 206):
+            raise reject(AUDIO_UNREACHABLE, f"Audio URL returned HTTP {response.status_code}")
+        total = total_size(response)
+        if total is not None and total > MAX_AUDIO_BYTES:
+            raise reject(AUDIO_TOO_LARGE, f"Audio is {total / 1048576:.1f} MB, above the {MAX_AUDIO_BYTES / 1048576:.0f} MB limit")
+        # Servers that ignore Range send the whole file; read only the head either way
+        head = response.raw.read(PREFLIGHT_SNIFF_BYTES, decode_content=True)
+
+    if total == 0 or not head:
+        raise reject(AUDIO_EMPTY, "Audio file is empty")
+
+    container = sniff_container(head)
+    probe = probe_head(head)
+    if probe == {} and container not in TRAILING_HEADER_CONTAINERS:
+        if container is None:
+            raise reject(AUDIO_UNSUPPORTED, "Unrecognised audio container")
+        raise reject(AUDIO_CORRUPT, f"No decodable audio stream in {container} file")
+
+    probe = probe or {}
+    estimated = wav_seconds(head, total) if container == "wav" else None
+    if estimated is None and total and probe.get("bit_rate"):
+        estimated = total * 8 / probe["bit_rate"]
+    check_duration(estimated)
+
+    return PreflightResult(total, container or probe.get("format"), probe.get("codec"), estimated)
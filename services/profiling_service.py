@@ -0,0 +1,254 @@
+import asyncio
+import contextvars
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, List, Optional, Set
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./data/profiles")
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_INTERVAL = float(os.getenv("PROFILING_INTERVAL_MS", "5")) / 1000.0
+MAX_STACK_DEPTH = 128
+
+_current_profile: contextvars.ContextVar = contextvars.ContextVar("current_profile", default=None)
+_task_factory_loops: Set[int] = set()
+
+
+def _safe_name(job_id: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]", "_", job_id)[:200]
+
+
+def _thread_cpu_clock(thread_id: int) -> Optional[int]:
+    try:
+        return time.pthread_getcpuclockid(thread_id)
+    except (AttributeError, OSError):
+        return None
+
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class RequestProfile:
+    """
+    Sampling wall/CPU profiler scoped to one request. Samples the threads currently doing work
+    for the request (executor threads registered through wrap_for_thread) and the event-loop thread
+    while it runs one of the request's tasks. Stacks are stored in folded (flamegraph) format.
+    """
+
+    def __init__(self, job_id: str, reason: str):
+        self.job_id = job_id
+        self.reason = reason
+        self.started = time.perf_counter()
+        self.cpu_started = time.process_time()
+        self.wall: Dict[str, float] = {}
+        self.cpu: Dict[str, float] = {}
+        self.samples = 0
+        self.tasks: Set[asyncio.Task] = set()
+        self._threads: Dict[int, Optional[int]] = {}  # thread id -> cpu clock id
+        self._last_cpu: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._sampler = threading.Thread(target=self._run, name=f"profiler-{job_id}", daemon=True)
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._last_cpu[self._loop_thread] = self._cpu_time(_thread_cpu_clock(self._loop_thread))
+        task = asyncio.current_task()
+        if task is not None:
+            self.tasks.add(task)
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._sampler.join(timeout=1)
+
+    def register_thread(self) -> None:
+        ident = threading.get_ident()
+        clock = _thread_cpu_clock(ident)
+        with self._lock:
+            self._threads[ident] = clock
+            self._last_cpu[ident] = self._cpu_time(clock)
+
+    def unregister_thread(self) -> None:
+        with self._lock:
+            self._threads.pop(threading.get_ident(), None)
+
+    @staticmethod
+    def _cpu_time(clock: Optional[int]) -> float:
+        return time.clock_gettime(clock) if clock is not None else 0.0
+
+    def _sample_thread(self, ident: int, clock: Optional[int], frame, interval: float) -> None:
+        stack = _collapse(frame)
+        now_cpu = self._cpu_time(clock)
+        cpu_delta = now_cpu - self._last_cpu.get(ident, now_cpu) if clock is not None else interval
+        self._last_cpu[ident] = now_cpu
+        self.wall[stack] = self.wall.get(stack, 0.0) + interval
+        if cpu_delta > 0:
+            self.cpu[stack] = self.cpu.get(stack, 0.0) + cpu_delta
+
+    def _run(self) -> None:
+        last = time.perf_counter()
+        loop_clock = _thread_cpu_clock(self._loop_thread)
+        while not self._stop.wait(PROFILING_INTERVAL):
+            now = time.perf_counter()
+            interval, last = now - last, now
+            frames = sys._current_frames()
+
+            with self._lock:
+                threads = list(self._threads.items())
+            for ident, clock in threads:
+                frame = frames.get(ident)
+                if frame is not None:
+                    self._sample_thread(ident, clock, frame, interval)
+
+            # The loop thread is shared with other requests; only count it while it runs one of ours.
+            loop_frame = frames.get(self._loop_thread)
+            if loop_frame is not None and asyncio.current_task(self._loop) in self.tasks:
+                self._sample_thread(self._loop_thread, loop_clock, loop_frame, interval)
+            else:
+                self._last_cpu[self._loop_thread] = self._cpu_time(loop_clock)
+            self.samples += 1
+
+    def save(self) -> str:
+        """
+        Writes wall.folded, cpu.folded and summary.json under PROFILE_DIR/<job id>/ and returns the directory.
+        """
+        directory = os.path.join(PROFILE_DIR, _safe_name(self.job_id))
+        os.makedirs(directory, exist_ok=True)
+
+        for name, stacks in (("wall.folded", self.wall), ("cpu.folded", self.cpu)):
+            with open(os.path.join(directory, name), "w") as f:
+                for stack, seconds in sorted(stacks.items(), key=lambda kv: -kv[1]):
+                    # folded format wants integer weights; use microseconds
+                    f.write(f"{stack} {int(seconds * 1_000_000)}\n")
+
+        def top(stacks: Dict[str, float]) -> List[Dict]:
+            leaf: Dict[str, float] = {}
+            for stack, seconds in stacks.items():
+                name = stack.rsplit(";", 1)[-1]
+                leaf[name] = leaf.get(name, 0.0) + seconds
+            return [{"function": k, "seconds": round(v, 4)} for k, v in sorted(leaf.items(), key=lambda kv: -kv[1])[:25]]
+
+        summary = {
+            "jobId": self.job_id,
+            "reason": self.reason,
+            "wallSeconds": round(time.perf_counter() - self.started, 4),
+            "processCpuSeconds": round(time.process_time() - self.cpu_started, 4),
+            "sampledWallSeconds": round(sum(self.wall.values()), 4),
+            "sampledCpuSeconds": round(sum(self.cpu.values()), 4),
+            "samples": self.samples,
+            "intervalMs": PROFILING_INTERVAL * 1000,
+            "topSelfWall": top(self.wall),
+            "topSelfCpu": top(self.cpu),
+        }
+        with open(os.path.join(directory, "summary.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+        return directory
+
+
+def _install_task_factory(loop: asyncio.AbstractEventLoop) -> None:
+    """
+    Tags tasks created inside a profiled request (e.g. asyncio.gather children) with that profile.
+    Installed on first use only, so a server that never profiles pays nothing.
+    """
+    if id(loop) in _task_factory_loops:
+        return
+    _task_factory_loops.add(id(loop))
+    previous = loop.get_task_factory()
+
+    def factory(loop, coro, **kwargs):
+        task = previous(loop, coro, **kwargs) if previous else asyncio.Task(coro, loop=loop, **kwargs)
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.tasks.add(task)
+            task.add_done_callback(profile.tasks.discard)
+        return task
+
+    loop.set_task_factory(factory)
+
+
+def is_privileged(header_value: Optional[str]) -> bool:
+    return bool(header_value and PROFILING_TOKEN and hmac.compare_digest(header_value.encode(), PROFILING_TOKEN.encode()))
+
+
+def profiling_reason(header_value: Optional[str]) -> Optional[str]:
+    if is_privileged(header_value):
+        return "header"
+    if PROFILING_SAMPLE_RATE > 0 and random.random() < PROFILING_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+@asynccontextmanager
+async def profile_request(job_id: str, header_value: Optional[str] = None):
+    """
+    Profiles the enclosed block when the privileged X-Audit-Profile header matches PROFILING_TOKEN,
+    or when the request is picked by PROFILING_SAMPLE_RATE. Yields the profile or None.
+    """
+    reason = profiling_reason(header_value)
+    if reason is None:
+        yield None
+        return
+
+    _install_task_factory(asyncio.get_running_loop())
+    profile = RequestProfile(job_id, reason)
+    token = _current_profile.set(profile)
+    profile.start()
+    try:
+        yield profile
+    finally:
+        _current_profile.reset(token)
+        profile.stop()
+        try:
+            directory = await asyncio.to_thread(profile.save)
+            print(f"[Profiler] Saved profile for {job_id} to {directory}")
+        except Exception as e:
+            print(f"[Profiler] Failed to save profile for {job_id}: {e}")
+
+
+def wrap_for_thread(fn: Callable) -> Callable:
+    """
+    Returns fn unchanged unless the calling context is profiled, in which case the executor
+    thread running it is sampled for the duration of the call.
+    """
+    profile = _current_profile.get()
+    if profile is None:
+        return fn
+
+    def profiled(*args, **kwargs):
+        profile.register_thread()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.unregister_thread()
+
+    return profiled
+
+
+def profile_files(job_id: str) -> List[str]:
+    directory = os.path.join(PROFILE_DIR, _safe_name(job_id))
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.listdir(directory))
+
+
+def profile_file_path(job_id: str, name: str) -> Optional[str]:
+    if name not in profile_files(job_id):
+        return None
+    return os.path.join(PROFILE_DIR, _safe_name(job_id), name)
@@ -0,0 +1,215 @@
+import bisect
+import os
+import re
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import regex
+
+from services.excerpt_service import as_segments
+from services.metrics_service import RULE_EVALUATIONS
+from services.transcript_service import seconds_to_timestamp
+
+# Deterministic matchers for mechanical rules ("agent said 'thank you for calling'"). A RuleItem with a
+# matcher is resolved here against the transcript segments and never reaches the LLM.
+
+# A literal hit is near-certain; an absence is weaker evidence since ASR can drop or mangle the phrase.
+PRESENT_CONFIDENCE = 0.95
+PROXIMITY_CONFIDENCE = 0.9
+ABSENT_CONFIDENCE = 0.8
+
+# Client regexes run with the `regex` module, which can stop a match that backtracks past
+# MATCHER_REGEX_TIMEOUT_SECONDS; such rules, like overlong or invalid patterns, go to the LLM instead
+MATCHER_MAX_PATTERN_CHARS = int(os.getenv("MATCHER_MAX_PATTERN_CHARS", "200"))
+MATCHER_REGEX_TIMEOUT_SECONDS = float(os.getenv("MATCHER_REGEX_TIMEOUT_SECONDS", "0.5"))
+
+_NON_WORD = re.compile(r"[^\w']+")
+
+
+def normalize(text: str) -> str:
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+class _SegmentText:
+    """Segments joined into one string, so matches can span segment boundaries, with offset -> segment lookup."""
+
+    def __init__(self, segments: List[Dict], transform):
+        self.segments = segments
+        self.offsets: List[int] = []
+        parts, position = [], 0
+        for seg in segments:
+            text = transform(seg["text"])
+            self.offsets.append(position)
+            parts.append(text)
+            position += len(text) + 1
+        self.text = " ".join(parts)
+
+    def segment_at(self, offset: int) -> Optional[Dict]:
+        if not self.segments:
+            return None  # a pattern matching the empty string matches even with no segments
+        return self.segments[max(0, bisect.bisect_right(self.offsets, offset) - 1)]
+
+    def find(self, pattern, timeout: Optional[float] = None) -> List[Tuple[Optional[float], str]]:
+        """Raises TimeoutError when a `regex` pattern runs past `timeout` seconds."""
+        hits = []
+        matches = pattern.finditer(self.text, timeout=timeout) if timeout else pattern.finditer(self.text)
+        for m in matches:
+            segment = self.segment_at(m.start())
+            hits.append((segment.get("start") if segment else None, m.group(0)))
+        return hits
+
+
+def _window(segments: List[Dict], start: Optional[float], end: Optional[float]) -> List[Dict]:
+    if start is None and end is None:
+        return segments
+    call_end = max(seg["start"] for seg in segments)
+    lower = (call_end + start if start < 0 else start) if start is not None else float("-inf")
+    upper = (call_end + end if end < 0 else end) if end is not None else float("inf")
+    return [seg for seg in segments if lower <= seg["start"] < upper]
+
+
+def _compile(matcher) -> list:
+    if matcher.type == "regex":
+        for p in matcher.patterns:
+            if len(p) > MATCHER_MAX_PATTERN_CHARS:
+                raise regex.error(f"pattern longer than {MATCHER_MAX_PATTERN_CHARS} characters")
+        return [regex.compile(p, regex.IGNORECASE | regex.VERSION0) for p in matcher.patterns]
+    return [re.compile(r"\b" + re.escape(normalize(p)) + r"\b") for p in matcher.patterns]
+
+
+def _find_all(matcher, segments: List[Dict]) -> Optional[List[List[Tuple[Optional[float], str]]]]:
+    """Occurrences (start time, matched text) per pattern, or None when the matcher can't run here."""
+    if not matcher.patterns:
+        return None
+    timed = all(seg.get("start") is not None for seg in segments)
+    if not timed and (matcher.startSeconds is not None or matcher.endSeconds is not None or matcher.withinSeconds):
+        return None  # time constraints need a timestamped transcript
+
+    if timed and segments:
+        segments = _window(segments, matcher.startSeconds, matcher.endSeconds)
+    try:
+        patterns = _compile(matcher)
+    except (re.error, regex.error) as e:
+        print(f"[RuleEngine] Invalid pattern, falling back to the LLM: {e}")
+        return None
+    if matcher.type != "regex":
+        text = _SegmentText(segments, normalize)
+        return [text.find(p) for p in patterns]
+    text = _SegmentText(segments, lambda t: " ".join(t.split()))
+    try:
+        return [text.find(p, MATCHER_REGEX_TIMEOUT_SECONDS) for p in patterns]
+    except TimeoutError:
+        print(f"[RuleEngine] Pattern ran past {MATCHER_REGEX_TIMEOUT_SECONDS}s, falling back to the LLM")
+        return None
+
+
+def _proximity_hit(hits: List[List[Tuple[Optional[float], str]]], within: float) -> Optional[Tuple[Optional[float], str]]:
+    """First occurrence of the first pattern that has every other pattern within `within` seconds of it."""
+    for anchor in hits[0]:
+        if all(any(abs(t - anchor[0]) <= within for t, _ in other) for other in hits[1:]):
+            return anchor
+    return None
+
+
+def _describe_window(matcher) -> str:
+    if matcher.startSeconds is None and matcher.endSeconds is None:
+        return "in the call"
+    start = matcher.startSeconds if matcher.startSeconds is not None else 0
+    if matcher.endSeconds is None:
+        return f"from {start:g}s" if start >= 0 else f"in the last {-start:g}s"
+    return f"between {start:g}s and {matcher.endSeconds:g}s"
+
+
+def evaluate_matcher(rule_id, rule: str, matcher, segments: List[Dict]) -> Optional[Dict]:
+    """
+    Resolves one rule locally. Returns a verdict in the LLM result shape, or None when the rule
+    should go to the LLM instead.
+    """
+    hits = _find_all(matcher, segments)
+    if hits is None:
+        return None
+
+    if matcher.type == "regex":
+        found = next((h[0] for h in hits if h), None)
+        confidence = PRESENT_CONFIDENCE
+    elif matcher.type == "proximity" and matcher.withinSeconds:
+        found = _proximity_hit(hits, matcher.withinSeconds) if all(hits) else None
+        confidence = PROXIMITY_CONFIDENCE
+    elif matcher.type in ("phrase", "proximity"):
+        found = hits[0][0] if all(hits) else None
+        confidence = PRESENT_CONFIDENCE
+    else:
+        print(f"[RuleEngine] Unknown matcher type '{matcher.type}', falling back to the LLM")
+        return None
+
+    where = _describe_window(matcher)
+    if found is not None:
+        at = f" at {seconds_to_timestamp(found[0])}" if found[0] is not None else ""
+        reason = f'Found "{found[1]}"{at} {where}.'
+    else:
+        reason = f"No match for {', '.join(repr(p) for p in matcher.patterns)} {where}."
+        confidence = ABSENT_CONFIDENCE
+
+    satisfied = (found is not None) == (matcher.expect != "absent")
+    return {
+        "ruleId": rule_id,
+        "rule": rule,
+        "result": "Yes" if satisfied else "No",
+        "reason": f"{reason} (matched locally)",
+        "confidenceScore": confidence,
+    }
+
+
+def split_local_rules(transcript: Union[str, List[Dict]], rules: Sequence) -> Tuple[Dict[int, Dict], List]:
+    """
+    Resolves every rule that carries a matcher. Returns ({rule position: verdict}, rules left for the LLM).
+    Parses the transcript and runs client regexes: call it off the event loop (run_in_thread).
+    """
+    local: Dict[int, Dict] = {}
+    remaining = []
+    segments = None
+    for i, item in enumerate(rules):
+        matcher = getattr(item, "matcher", None)
+        verdict = None
+        if matcher is not None:
+            segments = segments if segments is not None else as_segments(transcript)
+            verdict = evaluate_matcher(item.ruleId, item.rule.strip(), matcher, segments)
+        if verdict is None:
+            remaining.append(item)
+        else:
+            local[i] = verdict
+
+    RULE_EVALUATIONS.inc(len(local), engine="local")
+    RULE_EVALUATIONS.inc(len(remaining), engine="llm")
+    return local, remaining
+
+
+def merge_verdicts(rules: Sequence, local: Dict[int, Dict], llm_verdicts: List[Dict]) -> List[Dict]:
+    """
+    Puts local and LLM verdicts back in the original rule order. LLM verdicts are matched by ruleId;
+    any the model returned that can't be placed are appended.
+    """
+    pending = list(llm_verdicts)
+    merged = []
+    for i, item in enumerate(rules):
+        if i in local:
+            merged.append(local[i])
+            continue
+        rule_id = getattr(item, "ruleId", None)
+        match = next((v for v in pending if str(v.get("ruleId")) == str(rule_id)), None)
+        if match is not None:
+            pending.remove(match)
+            merged.append(match)
+    return merged + pending
+
+
+def align_verdicts(rules: Sequence, verdicts: List[Dict]) -> List[Optional[Dict]]:
+    """One verdict (or None when the model skipped it) per rule, matched by ruleId in rule order."""
+    pending = [v for v in verdicts if isinstance(v, dict)]
+    aligned = []
+    for item in rules:
+        rule_id = getattr(item, "ruleId", None)
+        match = next((v for v in pending if str(v.get("ruleId")) == str(rule_id)), None)
+        if match is not None:
+            pending.remove(match)
+        aligned.append(match)
+    return aligned
@@ -0,0 +1,73 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable
+
+from services.cancellation import (
+    DEADLINE_EXCEEDED, AuditCancelled, SharedUsage, current_usage, detached_context, remaining_seconds
+)
+from services.metrics_service import SINGLEFLIGHT_REQUESTS
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key onto one in-flight task. The first caller (leader)
+    starts the work; callers arriving before it finishes (followers) await the same result or exception.
+    The work runs as its own task, so one caller being cancelled doesn't cancel it for the others;
+    it is cancelled only once every caller waiting on it has been. The task doesn't inherit the leader's
+    deadline: each caller's own deadline applies only to its wait. Its stage time and tokens are split
+    across the ledgers of the callers that waited on it once it ends (see SharedUsage).
+    Nothing is cached after completion; that is the job store's concern.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self._usage: Dict[asyncio.Task, SharedUsage] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        task = self._inflight.get(key)
+        if task is None:
+            SINGLEFLIGHT_REQUESTS.inc(flight=self.name, result="leader")
+            usage = SharedUsage()
+            # create_task(context=...) needs 3.11; a task copies the context it is created in instead
+            task = detached_context(usage).run(asyncio.ensure_future, fn())
+            self._inflight[key] = task
+            self._usage[task] = usage
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            SINGLEFLIGHT_REQUESTS.inc(flight=self.name, result="shared")
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        if task in self._usage:
+            self._usage[task].join(current_usage())
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), remaining_seconds())
+        except asyncio.TimeoutError:
+            if task.done():
+                raise  # the shared work itself timed out
+            raise AuditCancelled(DEADLINE_EXCEEDED) from None
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    task.cancel()  # nobody is left waiting for the result
+
+    def _finished(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        self._usage.pop(task).settle()
+
+    def running(self, key: Hashable) -> bool:
+        """Whether a call for key would join work already in flight instead of starting it."""
+        return key in self._inflight
+
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+
+# <------- Flights shared across the pipeline ------->
+
+audio_flight = SingleFlight("audio_url")              # preflight + download + hash by audioUrl
+transcript_flight = SingleFlight("audio_content")     # transcription by (content hash, profile, language)
+llm_flight = SingleFlight("llm")                      # chat completions by (model, prompt, options)
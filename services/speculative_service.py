@@ -0,0 +1,79 @@
+import bisect
+import difflib
+import math
+import os
+from typing import Dict, List, Optional, Tuple
+
+from services.excerpt_service import EXCERPT_MIN_COVERAGE, EXCERPT_TOP_K, TranscriptIndex, tokenize
+from services.metrics_service import SPECULATIVE_SIMILARITY
+from services.transcription_profiles import DEFAULT_TRANSCRIPTION_PROFILE
+
+# Speculative evaluation: a fast draft transcript (SPECULATIVE_DRAFT_PROFILE) is evaluated while the
+# requested profile is still transcribing. When the accurate transcript arrives, a draft verdict is kept
+# if the rule's evidence (the BM25 windows excerpting would pick, in either transcript) reads the same
+# in both; otherwise the rule is evaluated again on the accurate transcript.
+
+SPECULATIVE_EVALUATION = os.getenv("SPECULATIVE_EVALUATION", "false").lower() == "true"
+SPECULATIVE_DRAFT_PROFILE = os.getenv("SPECULATIVE_DRAFT_PROFILE", "fast")
+SPECULATIVE_MIN_SIMILARITY = float(os.getenv("SPECULATIVE_MIN_SIMILARITY", "0.9"))  # token-level, 0-1
+SPAN_PADDING_SECONDS = 2.0  # the two models cut segments at different points
+
+
+def speculation_enabled(request) -> bool:
+    """Request flag, else SPECULATIVE_EVALUATION; pointless when the requested profile is the draft profile."""
+    enabled = SPECULATIVE_EVALUATION if request.speculative is None else request.speculative
+    return enabled and (request.transcriptionProfile or DEFAULT_TRANSCRIPTION_PROFILE) != SPECULATIVE_DRAFT_PROFILE
+
+
+def _ratio(a: List[str], b: List[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return difflib.SequenceMatcher(None, a, b).ratio()
+
+
+class EvidenceComparer:
+    """Compares the draft and accurate transcripts around each rule's evidence."""
+
+    def __init__(self, draft: List[Dict], accurate: List[Dict]):
+        self.transcripts = (draft, accurate)
+        self.indexes = (TranscriptIndex(draft), TranscriptIndex(accurate))
+        self.starts = tuple([seg.get("start") or 0.0 for seg in t] for t in self.transcripts)
+        # Rules without localized evidence depend on the whole call
+        self.whole = _ratio(*[[tok for seg in t for tok in tokenize(seg["text"])] for t in self.transcripts])
+
+    def spans(self, index: TranscriptIndex, terms: List[str]) -> List[Tuple[float, float]]:
+        spans = []
+        for w in index.top_windows(terms, EXCERPT_TOP_K):
+            after = w + index.window
+            end = index.segments[after].get("start") if after < len(index.segments) else None
+            spans.append(((index.segments[w].get("start") or 0.0) - SPAN_PADDING_SECONDS,
+                          end + SPAN_PADDING_SECONDS if end is not None else math.inf))
+        return spans
+
+    def tokens_in(self, which: int, spans: List[Tuple[float, float]]) -> List[str]:
+        starts = self.starts[which]
+        picked = set()
+        for first, last in spans:
+            picked.update(range(bisect.bisect_left(starts, first), bisect.bisect_left(starts, last)))
+        return [tok for i in sorted(picked) for tok in tokenize(self.transcripts[which][i]["text"])]
+
+    def similarity(self, rule: str) -> float:
+        terms = tokenize(rule)
+        found = [{t for t in terms if t in index.postings} for index in self.indexes]
+        if found[0] != found[1]:
+            # A rule term heard by only one model ("refund" vs "re fun") is exactly the change that matters
+            similarity = 0.0
+        elif min(index.coverage(terms) for index in self.indexes) < EXCERPT_MIN_COVERAGE:
+            similarity = self.whole
+        else:
+            # Evidence either model would point at: a phrase the draft misheard only shows up in one of them
+            spans = self.spans(self.indexes[0], terms) + self.spans(self.indexes[1], terms)
+            similarity = _ratio(self.tokens_in(0, spans), self.tokens_in(1, spans)) if spans else self.whole
+        SPECULATIVE_SIMILARITY.observe(similarity)
+        return similarity
+
+
+def draft_verdict_holds(comparer: EvidenceComparer, rule: str, verdict: Optional[Dict]) -> bool:
+    if verdict is None or verdict.get("result") == "Error":
+        return False
+    return comparer.similarity(rule) >= SPECULATIVE_MIN_SIMILARITY
@@ -0,0 +1,177 @@
+import io
+import json
+import math
+import re
+from typing import Dict, Iterable, List, Optional
+
+from services.transcript_service import seconds_to_timestamp
+
+# Parses client-supplied transcripts into the segment structure Whisper produces
+# ([{"start": seconds, "text": str}]), so they get the same segment-level handling
+# (excerpting, local rule matching) as transcribed audio. Supported inputs:
+#   - JSON: a list of segments, or {"segments": [...]}, with start/text (startTime/start_time also accepted;
+#     start in seconds or as a "1:02" / "0:01:02.5" string)
+#   - WebVTT and SRT cues
+#   - plain text with timestamps (0:00:12, 12:34, [00:01:02]), one per line or glued to the text
+# Untimed text becomes one segment per line/sentence with start=None.
+
+TIMESTAMP_PATTERN = re.compile(r"(?<![\d:])\[?(?:(\d{1,2}):)?(\d{1,2}):(\d{2})(?:[.,]\d{1,3})?\]?(?![\d:])")
+CUE_TIME_PATTERN = re.compile(r"(?:(\d+):)?(\d{1,2}):(\d{2})[.,](\d{1,3})")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+TAG_PATTERN = re.compile(r"<[^>]+>")
+START_STRING_PATTERN = re.compile(r"(?:(\d+):)?(\d{1,2}):(\d{2})(?:[.,](\d{1,3}))?")
+
+INVALID_TRANSCRIPT = "invalid_transcript"
+
+
+class TranscriptRejected(ValueError):
+    """Raised for a supplied transcript that is JSON but not a valid segment list."""
+
+    code = INVALID_TRANSCRIPT
+
+
+def _clean(text: str) -> str:
+    return " ".join(text.split())
+
+
+def _seconds(hours: Optional[str], minutes: str, seconds: str, fraction: str = "") -> float:
+    value = int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds)
+    return value + (int(fraction) / 10 ** len(fraction) if fraction else 0.0)
+
+
+def _json_start(value, index: int) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        match = START_STRING_PATTERN.fullmatch(value.strip())
+        if match:
+            return _seconds(*match.groups(default=""))
+        try:
+            value = float(value)
+        except ValueError:
+            raise TranscriptRejected(f"segments[{index}].start is not a time: {value!r}") from None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value < 0:
+        raise TranscriptRejected(f"segments[{index}].start is not a time: {value!r}")
+    return float(value)
+
+
+def parse_json_segments(text: str) -> List[Dict]:
+    """Raises json.JSONDecodeError for text that isn't JSON, TranscriptRejected for JSON of the wrong shape."""
+    data = json.loads(text)
+    if isinstance(data, dict):
+        data = data.get("segments")
+    if not isinstance(data, list):
+        raise TranscriptRejected('Expected a list of segments or {"segments": [...]}')
+    segments = []
+    for i, item in enumerate(data):
+        if not isinstance(item, dict):
+            raise TranscriptRejected(f"segments[{i}] is not an object")
+        if not isinstance(item.get("text", ""), str):
+            raise TranscriptRejected(f"segments[{i}].text is not a string")
+        if not item.get("text", "").strip():
+            continue
+        start = item.get("start", item.get("startTime", item.get("start_time")))
+        segments.append({"start": _json_start(start, i), "text": _clean(item["text"])})
+    return segments
+
+
+def parse_cues(lines: Iterable[str]) -> List[Dict]:
+    """WebVTT/SRT: a "-->" line starts a cue, its text runs to the next blank line. Indexes, NOTE and STYLE blocks are skipped."""
+    segments = []
+    start = None
+    text: List[str] = []
+    for line in lines:
+        line = line.strip()
+        if "-->" in line:
+            match = CUE_TIME_PATTERN.search(line.split("-->", 1)[0])
+            start = _seconds(*match.groups(default="")) if match else None
+            text = []
+        elif not line:
+            if text:
+                segments.append({"start": start, "text": _clean(TAG_PATTERN.sub("", " ".join(text)))})
+            start, text = None, []
+        elif start is not None or text:
+            text.append(line)
+    if text:
+        segments.append({"start": start, "text": _clean(TAG_PATTERN.sub("", " ".join(text)))})
+    return [seg for seg in segments if seg["text"]]
+
+
+def _is_timestamp(text: str, match: "re.Match") -> bool:
+    """
+    Separates mm:ss timestamps from times mentioned in speech ("call me at 10:30"): accept bracketed or
+    line-leading stamps, and stamps glued to the previous word (pasted from a player UI). h:mm:ss always counts.
+    """
+    if text[match.start()] == "[":
+        return True
+    before = text[match.start() - 1] if match.start() else "\n"
+    if before == "\n" or not before.isspace():
+        return True
+    line_start = text.rfind("\n", 0, match.start()) + 1
+    return not text[line_start:match.start()].strip()
+
+
+def parse_timestamped_text(text: str) -> List[Dict]:
+    """One finditer pass: text between consecutive timestamps becomes a segment starting at the first one."""
+    segments = []
+    append = segments.append
+    start, position, last = None, 0, -1.0
+    for match in TIMESTAMP_PATTERN.finditer(text):
+        hours, minutes, secs = match.group(1, 2, 3)
+        if hours is None and not _is_timestamp(text, match):
+            continue
+        seconds = (int(hours) * 3600 if hours else 0) + int(minutes) * 60 + int(secs)
+        if seconds < last:  # out-of-order "timestamp" is a time mentioned in the text
+            continue
+        chunk = " ".join(text[position:match.start()].split())
+        if chunk:
+            append({"start": start if start is not None else 0.0, "text": chunk})
+        start, position, last = float(seconds), match.end(), seconds
+    if start is None:
+        return []
+    chunk = " ".join(text[position:].split())
+    if chunk:
+        append({"start": start, "text": chunk})
+    return segments
+
+
+def parse_untimed_text(text: str) -> List[Dict]:
+    segments = []
+    for line in io.StringIO(text):
+        for sentence in SENTENCE_PATTERN.split(line):
+            sentence = _clean(sentence)
+            if sentence:
+                segments.append({"start": None, "text": sentence})
+    return segments
+
+
+def parse_transcript(text: str) -> List[Dict]:
+    """
+    Parses a supplied transcript (format detected from its first characters) into segments.
+    Raises TranscriptRejected for JSON that isn't a valid segment list; text that only looks like JSON
+    is parsed as text.
+    """
+    head = text.lstrip()[:16]
+    if head.startswith(("[{", "{")) or (head.startswith("[") and head[1:].lstrip().startswith(("{", "]"))):
+        try:
+            return parse_json_segments(text)
+        except json.JSONDecodeError:
+            pass
+    if head.startswith("WEBVTT") or "-->" in text[:512]:
+        return parse_cues(io.StringIO(text))
+    return parse_timestamped_text(text) or parse_untimed_text(text)
+
+
+def render_segments(segments) -> str:
+    """
+    Compact prompt text for segments: "[h:mm:ss] text" lines, or plain sentences when untimed.
+    Plain-string transcripts (stored by earlier versions) pass through.
+    """
+    if isinstance(segments, str):
+        return segments
+    if all(seg.get("start") is None for seg in segments):
+        return " ".join(seg["text"].strip() for seg in segments)
+    return "\n".join(
+        f"[{seconds_to_timestamp(seg['start'])}] {seg['text'].strip()}" if seg.get("start") is not None else seg["text"].strip()
+        for seg in segments
+    )
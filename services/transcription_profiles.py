@@ -0,0 +1,41 @@
+import os
+from typing import Dict, Optional
+
+# Named speed/accuracy trade-offs, selectable per AuditRequest.transcriptionProfile.
+# "balanced" matches the original hard-coded behaviour (base model, Whisper's default decoding).
+TEMPERATURE_FALLBACK = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+TRANSCRIPTION_PROFILES = {
+    "fast": {
+        "model": "tiny",
+        "beam_size": None,          # greedy decoding
+        "best_of": None,
+        "temperature": 0.0,         # no fallback re-decodes
+        "condition_on_previous_text": False,
+        "threads": int(os.getenv("WHISPER_FAST_THREADS", "0")),
+    },
+    "balanced": {
+        "model": "base",
+        "beam_size": None,
+        "best_of": 5,
+        "temperature": TEMPERATURE_FALLBACK,
+        "condition_on_previous_text": True,
+        "threads": int(os.getenv("WHISPER_BALANCED_THREADS", "0")),
+    },
+    "accurate": {
+        "model": os.getenv("WHISPER_ACCURATE_MODEL", "small"),
+        "beam_size": 5,
+        "best_of": 5,
+        "temperature": TEMPERATURE_FALLBACK,
+        "condition_on_previous_text": True,
+        "threads": int(os.getenv("WHISPER_ACCURATE_THREADS", "0")),
+    },
+}
+DEFAULT_TRANSCRIPTION_PROFILE = os.getenv("TRANSCRIPTION_PROFILE", "balanced")
+DEFAULT_LANGUAGE = os.getenv("WHISPER_LANGUAGE", "en")
+
+
+def resolve_transcription_profile(name: Optional[str] = None) -> Dict:
+    name = name or DEFAULT_TRANSCRIPTION_PROFILE
+    if name not in TRANSCRIPTION_PROFILES:
+        raise ValueError(f"Unknown transcription profile '{name}', expected one of {sorted(TRANSCRIPTION_PROFILES)}")
+    return TRANSCRIPTION_PROFILES[name]
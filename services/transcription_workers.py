@@ -0,0 +1,226 @@
+import argparse
+import gc
+import os
+import secrets
+import signal
+import stat
+import tempfile
+import time
+from multiprocessing.connection import Client, Listener
+from typing import Dict, List, Optional
+
+from services.cancellation import AuditCancelled, check_cancelled, on_cancel
+from services.metrics_service import TRANSCRIBE_AUDIO_SECONDS, TRANSCRIBE_RTF, TRANSCRIBE_SECONDS
+
+# Transcription worker pool. A supervisor loads the Whisper weights once, freezes the heap and forks
+# workers that share those pages copy-on-write. API processes talk to the pool over a Unix socket,
+# so they never import torch and can be scaled separately from transcription capacity.
+#
+#   python -m services.transcription_workers --workers 4
+#
+# The audio path is passed by name, so API and workers must share a filesystem (same host).
+# An abandoned audit kills its worker mid-transcription; the supervisor forks a replacement.
+# The socket lives in a directory only the pool's user can enter (0700). Unless TRANSCRIPTION_WORKER_AUTHKEY
+# is set, the supervisor generates a random key at startup and leaves it in that directory for the API.
+
+WORKER_SOCKET = os.getenv("TRANSCRIPTION_WORKER_SOCKET")
+WORKER_AUTHKEY = os.getenv("TRANSCRIPTION_WORKER_AUTHKEY")
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), f"audit-transcription-{os.getuid()}", "workers.sock")
+AUTHKEY_FILE = "authkey"
+WORKER_COUNT = int(os.getenv("TRANSCRIPTION_WORKERS", "0"))  # 0 = cores / threads per worker
+WORKER_THREADS = int(os.getenv("TRANSCRIPTION_WORKER_THREADS", "2"))
+WORKER_PRELOAD = [p for p in os.getenv("TRANSCRIPTION_WORKER_PRELOAD", "balanced").split(",") if p]
+
+
+# <------- Client (API side) ------->
+
+def transcribe_audio(audio_path: str, profile_name: Optional[str] = None, language: Optional[str] = None) -> List[Dict]:
+    """
+    Transcribes through the worker pool when TRANSCRIPTION_WORKER_SOCKET is set, otherwise in-process.
+    Raises when transcription fails, so a failed audit isn't mistaken for silent audio.
+    """
+    if not WORKER_SOCKET:
+        from services.whisper_service import transcribe_with_duration
+        segments, _ = transcribe_with_duration(audio_path, profile_name, language)
+        return segments
+    return transcribe_audio_remote(audio_path, profile_name, language)
+
+
+def transcribe_audio_remote(audio_path: str, profile_name: Optional[str] = None, language: Optional[str] = None) -> List[Dict]:
+    started = time.perf_counter()
+    try:
+        conn = Client(WORKER_SOCKET, family="AF_UNIX", authkey=worker_authkey(WORKER_SOCKET))
+    except OSError as e:
+        raise RuntimeError(f"Transcription workers unavailable at {WORKER_SOCKET}: {e}")
+
+    with conn:
+        worker_pid = conn.recv()["pid"]
+        conn.send({"audioPath": os.path.abspath(audio_path), "profile": profile_name, "language": language})
+        with on_cancel(lambda: _kill_worker(worker_pid)):
+            try:
+                while not conn.poll(0.5):
+                    check_cancelled()
+                reply = conn.recv()
+            except AuditCancelled:
+                _kill_worker(worker_pid)
+                raise
+            except EOFError:
+                check_cancelled()
+                raise RuntimeError(f"Transcription worker {worker_pid} exited before replying")
+
+    if not reply["ok"]:
+        raise RuntimeError(f"Transcription worker {worker_pid} failed: {reply['error']}")
+
+    elapsed = time.perf_counter() - started
+    model = reply["model"]
+    TRANSCRIBE_SECONDS.observe(elapsed, backend="worker-pool", model=model)
+    TRANSCRIBE_AUDIO_SECONDS.inc(reply["audioSeconds"], backend="worker-pool", model=model)
+    if reply["audioSeconds"] > 0:
+        TRANSCRIBE_RTF.observe(elapsed / reply["audioSeconds"], backend="worker-pool", model=model)
+    return reply["segments"]
+
+
+def _kill_worker(pid: int) -> None:
+    try:
+        os.kill(pid, signal.SIGKILL)
+        print(f"[Transcription] Killed worker {pid} for an abandoned audit")
+    except ProcessLookupError:
+        pass
+
+
+def worker_authkey(socket_path: str) -> bytes:
+    """TRANSCRIPTION_WORKER_AUTHKEY, else the key the running supervisor generated next to its socket."""
+    if WORKER_AUTHKEY:
+        return WORKER_AUTHKEY.encode()
+    with open(os.path.join(os.path.dirname(socket_path), AUTHKEY_FILE), "rb") as f:
+        return f.read()
+
+
+# <------- Workers ------->
+
+def _worker_loop(listener: Listener, threads: int) -> None:
+    import torch
+    from services.transcription_profiles import resolve_transcription_profile
+    from services.whisper_service import transcribe_with_duration
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the supervisor decides when workers stop
+    torch.set_num_threads(threads)
+
+    while True:
+        try:
+            conn = listener.accept()
+        except Exception as e:
+            print(f"[TranscriptionWorker {os.getpid()}] Rejected connection: {e}")
+            continue
+
+        with conn:
+            try:
+                conn.send({"pid": os.getpid()})
+                job = conn.recv()
+                model = resolve_transcription_profile(job.get("profile"))["model"]
+                segments, duration = transcribe_with_duration(job["audioPath"], job.get("profile"), job.get("language"))
+                conn.send({"ok": True, "segments": segments, "audioSeconds": duration, "model": model})
+            except (EOFError, BrokenPipeError):
+                print(f"[TranscriptionWorker {os.getpid()}] Client went away")
+            except Exception as e:
+                print(f"[TranscriptionWorker {os.getpid()}] {e}")
+                try:
+                    conn.send({"ok": False, "error": str(e)})
+                except OSError:
+                    pass
+
+
+# <------- Supervisor ------->
+
+def _private_directory(path: str) -> None:
+    """Creates the socket's directory, or checks an existing one: owned by this user, mode 0700."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise RuntimeError(f"Socket directory {path} must be a directory owned by this user with mode 0700")
+
+
+def _generate_authkey(socket_path: str) -> bytes:
+    key = secrets.token_hex(32).encode()
+    fd = os.open(os.path.join(os.path.dirname(socket_path), AUTHKEY_FILE), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    return key
+
+
+def serve(socket_path: str, workers: int, threads: int, preload: List[str]) -> None:
+    import torch
+    from services.transcription_profiles import resolve_transcription_profile
+    from services.whisper_service import WhisperModelPool
+
+    # Keep the supervisor single-threaded: OpenMP pools started before fork() do not survive in children.
+    torch.set_num_threads(1)
+    for name in preload:
+        WhisperModelPool.get_model(resolve_transcription_profile(name)["model"])
+
+    _private_directory(os.path.dirname(os.path.abspath(socket_path)))
+    authkey = WORKER_AUTHKEY.encode() if WORKER_AUTHKEY else _generate_authkey(socket_path)
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    listener = Listener(socket_path, family="AF_UNIX", authkey=authkey)
+
+    # Move everything loaded so far out of the collector's reach, so GC passes in the workers
+    # don't write to (and un-share) the pages holding the model objects.
+    gc.collect()
+    gc.freeze()
+
+    children: Dict[int, int] = {}  # pid -> slot
+    stopping = False
+
+    def spawn(slot: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _worker_loop(listener, threads)
+            finally:
+                os._exit(0)
+        children[pid] = slot
+        print(f"[TranscriptionSupervisor] Worker {slot} started (pid {pid})")
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    for slot in range(workers):
+        spawn(slot)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"[TranscriptionSupervisor] {workers} workers x {threads} threads listening on {socket_path}")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        slot = children.pop(pid, None)
+        if slot is not None and not stopping:
+            print(f"[TranscriptionSupervisor] Worker {slot} (pid {pid}) exited with status {status}, respawning")
+            spawn(slot)
+
+    listener.close()
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    print("[TranscriptionSupervisor] Stopped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Whisper transcription worker pool.")
+    parser.add_argument("--socket", default=WORKER_SOCKET or DEFAULT_SOCKET, help="Created in a private (0700) directory")
+    parser.add_argument("--workers", type=int, default=WORKER_COUNT)
+    parser.add_argument("--threads", type=int, default=WORKER_THREADS, help="torch threads per worker")
+    parser.add_argument("--preload", default=",".join(WORKER_PRELOAD), help="Comma-separated profiles to load before forking")
+    args = parser.parse_args()
+
+    workers = args.workers or max(1, (os.cpu_count() or 1) // max(1, args.threads))
+    serve(args.socket, workers, args.threads, [p for p in args.preload.split(",") if p])
@@ -1,8 +1,13 @@
 import gc
 import threading
+import time
+import wave
 import torch
 import whisper
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+
+from services.metrics_service import TRANSCRIBE_AUDIO_SECONDS, TRANSCRIBE_RTF, TRANSCRIBE_SECONDS, record_cache
+from services.transcription_profiles import DEFAULT_LANGUAGE, resolve_transcription_profile
 
 # Load the model once (use "base", "medium", or "large"), change to "large" for better accuracy
 # model = whisper.load_model("base")
@@ -12,50 +17,116 @@ from typing import List, Dict
 #     return result.get("text", "")
 
 class WhisperModelPool:
-    _model = None
+    _models: Dict[str, object] = {}
     _lock = threading.Lock()
 
     @classmethod
     def get_model(cls, model_size="base"):
         with cls._lock:
-            if cls._model is None:
-                print("[WhisperPool] Loading Whisper model...")
-                cls._model = whisper.load_model(model_size)
-            return cls._model
+            record_cache("whisper_model", model_size in cls._models)
+            if model_size not in cls._models:
+                print(f"[WhisperPool] Loading Whisper model '{model_size}'...")
+                cls._models[model_size] = whisper.load_model(model_size)
+            return cls._models[model_size]
 
     @classmethod
     def clear_model(cls):
         with cls._lock:
-            if cls._model:
-                print("[WhisperPool] Unloading Whisper model...")
-                del cls._model
-                cls._model = None
+            if cls._models:
+                print("[WhisperPool] Unloading Whisper models...")
+                cls._models.clear()
                 gc.collect()
 
                 if torch.cuda.is_available():
                     torch.cuda.empty_cache()
-                    
 
-def transcribe_audio_whisper(audio_path: str) -> List[Dict]:
+
+def detect_language(model, audio) -> str:
+    """
+    Detects the spoken language once, from the first 30-second window only.
+    """
+    window = whisper.pad_or_trim(audio)
+    mel = whisper.log_mel_spectrogram(window, model.dims.n_mels).to(model.device)
+    _, probs = model.detect_language(mel)
+    return max(probs, key=probs.get)
+
+
+def decode_options(profile: Dict) -> Dict:
+    options = {
+        "temperature": profile["temperature"],
+        "condition_on_previous_text": profile["condition_on_previous_text"],
+        "fp16": torch.cuda.is_available(),  # fp16 is unsupported on CPU and only triggers a warning
+    }
+    if profile["beam_size"]:
+        options["beam_size"] = profile["beam_size"]
+    if profile["best_of"] and not profile["beam_size"]:
+        options["best_of"] = profile["best_of"]
+    return options
+
+
+def audio_duration_seconds(audio_path: str, segments: List[Dict]) -> float:
+    """
+    Reads the duration from the WAV header (transcoded input is always WAV), else uses the last segment end.
+    """
+    try:
+        with wave.open(audio_path, "rb") as wav:
+            return wav.getnframes() / float(wav.getframerate())
+    except Exception:
+        return max((seg.get("end", seg.get("start", 0.0)) for seg in segments), default=0.0)
+
+
+def record_transcription(backend: str, model_size: str, duration: float, started: float) -> None:
+    elapsed = time.perf_counter() - started
+    TRANSCRIBE_SECONDS.observe(elapsed, backend=backend, model=model_size)
+    TRANSCRIBE_AUDIO_SECONDS.inc(duration, backend=backend, model=model_size)
+    if duration > 0:
+        TRANSCRIBE_RTF.observe(elapsed / duration, backend=backend, model=model_size)
+
+
+def transcribe_with_duration(audio_path: str, profile_name: Optional[str] = None, language: Optional[str] = None) -> Tuple[List[Dict], float]:
+    """
+    Transcribes with the given profile and returns (segments, audio duration in seconds). Raises on failure.
+    """
+    profile = resolve_transcription_profile(profile_name)
+    model = WhisperModelPool.get_model(profile["model"])
+    if profile["threads"] and torch.get_num_threads() != profile["threads"]:
+        torch.set_num_threads(profile["threads"])  # process-wide setting
+
+    started = time.perf_counter()
+    audio = whisper.load_audio(audio_path)  # decoded once, shared by detection and transcription
+
+    language = language or DEFAULT_LANGUAGE
+    if language == "auto":
+        language = detect_language(model, audio)
+        print(f"[Whisper] Detected language: {language}")
+
+    result = model.transcribe(audio, language=language, verbose=None, **decode_options(profile))
+
+    duration = len(audio) / whisper.audio.SAMPLE_RATE
+    record_transcription("openai-whisper", profile["model"], duration, started)
+    segments = [
+        {"start": seg["start"], "text": seg["text"].strip()}
+        for seg in result.get("segments", [])
+    ]
+    return segments, duration
+
+
+def transcribe_audio_whisper(audio_path: str, profile_name: Optional[str] = None, language: Optional[str] = None) -> List[Dict]:
     """
     Transcribes audio using OpenAI Whisper via a shared model pool.
     Returns a list of segments with start time and text.
+    profile_name picks model size and decoding options (see TRANSCRIPTION_PROFILES).
+    language="auto" detects the language once on the first window; default is WHISPER_LANGUAGE ("en").
     Spanish : language="es"
     English : language="en"
     """
     try:
-        model = WhisperModelPool.get_model()
-        result = model.transcribe(audio_path, language="en", verbose=False)
-
-        segments = result.get("segments", [])
-        return [
-            {"start": seg["start"], "text": seg["text"].strip()}
-            for seg in segments
-        ]
+        segments, _ = transcribe_with_duration(audio_path, profile_name, language)
+        return segments
     except Exception as e:
         print(f"[Whisper Error] {e}")
         return []
-    
+
 
 import os
 
@@ -73,8 +144,11 @@ def transcribe_audio_hybrid_whisper(audio_path: str) -> List[Dict]:
             try:
                 from faster_whisper import WhisperModel as FastWhisperModel
                 model = FastWhisperModel("base", device="cuda" if torch.cuda.is_available() else "cpu", compute_type="int8")
+                started = time.perf_counter()
                 segments, _ = model.transcribe(audio_path)
-                return [{"start": seg.start, "text": seg.text.strip()} for seg in segments]
+                segments = [{"start": seg.start, "end": seg.end, "text": seg.text.strip()} for seg in segments]
+                record_transcription("faster-whisper", "base", audio_duration_seconds(audio_path, segments), started)
+                return [{"start": seg["start"], "text": seg["text"]} for seg in segments]
             except ImportError:
                 print("[Whisper Warning] faster-whisper not installed, falling back to OpenAI Whisper")
             except Exception as fe:
@@ -83,8 +157,10 @@ def transcribe_audio_hybrid_whisper(audio_path: str) -> List[Dict]:
         else:
             print("[Whisper] Using openai-whisper for transcription")
             model = WhisperModelPool.get_model()
+            started = time.perf_counter()
             result = model.transcribe(audio_path, language="en", verbose=False)
             segments = result.get("segments", [])
+            record_transcription("openai-whisper", "base", audio_duration_seconds(audio_path, segments), started)
             return [
                 {"start": seg["start"], "text": seg["text"].strip()}
                 for seg in segments
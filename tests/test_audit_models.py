@@ -0,0 +1,26 @@
+import typing
+import unittest
+
+from pydantic import ValidationError
+
+from dtos.audit_models import AuditRequest, LiveAuditStart, TranscriptionProfileName
+from services.transcription_profiles import TRANSCRIPTION_PROFILES
+
+
+class TranscriptionProfileFieldTest(unittest.TestCase):
+    def test_literal_matches_defined_profiles(self):
+        self.assertEqual(set(typing.get_args(TranscriptionProfileName)), set(TRANSCRIPTION_PROFILES))
+
+    def test_unknown_profile_is_a_validation_error(self):
+        with self.assertRaises(ValidationError):
+            AuditRequest(audioUrl="http://example.com/a.wav", parameter=[], transcriptionProfile="ultra")
+        with self.assertRaises(ValidationError):
+            LiveAuditStart(parameter=[], transcriptionProfile="ultra")
+
+    def test_known_or_missing_profile_is_accepted(self):
+        self.assertEqual(AuditRequest(audioUrl="u", parameter=[], transcriptionProfile="fast").transcriptionProfile, "fast")
+        self.assertIsNone(AuditRequest(audioUrl="u", parameter=[]).transcriptionProfile)
+
+
+if __name__ == "__main__":
+    unittest.main()
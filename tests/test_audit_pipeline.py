@@ -0,0 +1,56 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+os.environ.setdefault("OPENAI_API_KEY", "test")  # services.openai_service builds its client at import
+
+from dtos.audit_models import AuditRequest
+from services import audit_pipeline
+from services.admission_service import AdmissionController
+
+
+def fake_download(url: str) -> str:
+    fd, path = tempfile.mkstemp(suffix=".wav")
+    os.write(fd, url.encode())
+    os.close(fd)
+    return path
+
+
+def fake_transcribe(path, profile, language):
+    time.sleep(0.2)
+    return [{"start": 0.0, "text": "hello"}]
+
+
+class SharedTranscriptionAdmissionTest(unittest.IsolatedAsyncioTestCase):
+    async def test_followers_do_not_reserve_budget(self):
+        # Room for one 600 s transcription: a second reservation for the same audio would be rejected
+        controller = AdmissionController(max_inflight_cost=700, max_memory_bytes=1 << 40)
+        patches = [
+            mock.patch.object(audit_pipeline, "admission_controller", controller),
+            mock.patch.object(audit_pipeline, "PREFLIGHT_ENABLED", False),
+            mock.patch.object(audit_pipeline, "download_audio", fake_download),
+            mock.patch.object(audit_pipeline, "probe_audio_duration", lambda path: 600.0),
+            mock.patch.object(audit_pipeline, "transcode_to_whisper_wav", lambda path: path),
+            mock.patch.object(audit_pipeline, "transcribe_audio", fake_transcribe),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        request = AuditRequest(audioUrl="http://example.com/call.wav", parameter=[])
+        leader = asyncio.ensure_future(audit_pipeline.transcribe_from_url(request, audit_pipeline._no_stage, 0, {}))
+        await asyncio.sleep(0.1)
+        self.assertEqual(len(controller._inflight), 1)
+        follower = audit_pipeline.transcribe_from_url(request, audit_pipeline._no_stage, 0, {})
+
+        results = await asyncio.gather(leader, follower)
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(controller._inflight, [])  # the leader's reservation ended with the shared work
+        self.assertEqual(audit_pipeline._audio_files, {})  # and the shared download was removed
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import unittest
+from unittest import mock
+
+os.environ.setdefault("OPENAI_API_KEY", "test")  # services.openai_service builds its client at import
+
+from dtos.audit_models import ParameterRule, RuleItem
+from services import cascade_service
+
+
+class LocalEscalationTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.param = ParameterRule(id=1, name="Greeting", ruleList=[
+            RuleItem(ruleId="a", rule="Agent greeted the caller"),
+            RuleItem(ruleId="b", rule="Agent gave their name"),
+        ])
+
+    def test_local_verdicts_fall_below_the_default_threshold(self):
+        local = cascade_service.local_verdicts(self.param, ["Agent greeted the caller", "Agent gave their name"],
+                                               [{"result": "Yes", "reason": "said hello"}, {"result": "No", "reason": "no name"}])
+        self.assertLess(cascade_service.CASCADE_LOCAL_CONFIDENCE, cascade_service.CASCADE_MIN_CONFIDENCE)
+        self.assertTrue(all(cascade_service.needs_escalation(v) for v in local["rules"]))
+
+    async def test_local_verdict_escalates_to_the_strong_model(self):
+        rules = [item.rule for item in self.param.ruleList]
+        strong_calls = []
+
+        async def evaluate_tier(tier, model, transcript, param):
+            if tier == "cheap":
+                return cascade_service.local_verdicts(param, rules, [{"result": "Yes", "reason": "said hello"}] * 2)
+            strong_calls.append([item.ruleId for item in param.ruleList])
+            return {"id": param.id, "name": param.name, "rules": [
+                {"ruleId": item.ruleId, "rule": item.rule, "result": "No", "reason": "strong", "confidenceScore": 0.95}
+                for item in param.ruleList
+            ]}
+
+        with mock.patch.object(cascade_service, "evaluate_tier", evaluate_tier), \
+                mock.patch.object(cascade_service, "CASCADE_CHEAP_MODEL", cascade_service.LOCAL_MODEL):
+            result = await cascade_service.evaluate_param_cascade("transcript", self.param)
+
+        self.assertEqual(strong_calls, [["a", "b"]])
+        self.assertEqual([v["reason"] for v in result["rules"]], ["strong", "strong"])
+
+    async def test_trusted_local_verdict_is_kept(self):
+        rules = [item.rule for item in self.param.ruleList]
+
+        async def evaluate_tier(tier, model, transcript, param):
+            self.assertEqual(tier, "cheap")
+            return cascade_service.local_verdicts(param, rules, [{"result": "Yes", "reason": "said hello"}] * 2)
+
+        with mock.patch.object(cascade_service, "evaluate_tier", evaluate_tier), \
+                mock.patch.object(cascade_service, "CASCADE_LOCAL_CONFIDENCE", 0.9):
+            result = await cascade_service.evaluate_param_cascade("transcript", self.param)
+        self.assertEqual([v["result"] for v in result["rules"]], ["Yes", "Yes"])
+
+
+if __name__ == "__main__":
+    unittest.main()
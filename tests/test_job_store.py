@@ -0,0 +1,57 @@
+import os
+import tempfile
+import time
+import unittest
+
+os.environ.setdefault("JOB_STORE_PATH", os.path.join(tempfile.mkdtemp(), "jobs.sqlite3"))  # keep the module-level store out of ./data
+
+from services.job_store import JobStore
+
+
+class PruneFinishedTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.store = JobStore(os.path.join(self.dir.name, "jobs.sqlite3"), retention_seconds=3600)
+
+    def tearDown(self):
+        self.store._conn.close()
+        self.dir.cleanup()
+
+    def add(self, job_id: str, age: float, finish=None) -> None:
+        self.store.create_or_get(job_id, "audit", {"sampleId": job_id})
+        self.store.save_evaluation(job_id, "p1", {"answer": "yes"})
+        if finish:
+            finish(job_id)
+        self.store._execute("UPDATE jobs SET updated_at = ? WHERE job_id = ?", (time.time() - age, job_id))
+
+    def test_prunes_only_old_finished_jobs(self):
+        self.add("old-done", 7200, lambda job: self.store.complete(job, {"ok": True}))
+        self.add("old-failed", 7200, lambda job: self.store.fail(job, "boom"))
+        self.add("old-running", 7200, self.store.mark_running)
+        self.add("old-webhook-pending", 7200, lambda job: (
+            self.store.complete(job, {"ok": True}), self.store.set_webhook_status(job, "pending")))
+        self.add("fresh-done", 60, lambda job: self.store.complete(job, {"ok": True}))
+
+        self.assertEqual(self.store.prune_finished(), 2)
+        self.assertIsNone(self.store.get("old-done"))
+        self.assertIsNone(self.store.get("old-failed"))
+        self.assertEqual(self.store.get_evaluations("old-done"), {})
+        for job_id in ("old-running", "old-webhook-pending", "fresh-done"):
+            self.assertIsNotNone(self.store.get(job_id))
+            self.assertEqual(self.store.get_evaluations(job_id), {"p1": {"answer": "yes"}})
+
+    def test_sweeps_on_insert_after_interval(self):
+        self.add("old-done", 7200, lambda job: self.store.complete(job, {"ok": True}))
+        self.store._next_prune = 0.0
+        self.store.create_or_get("new", "audit", {"sampleId": "new"})
+        self.assertIsNone(self.store.get("old-done"))
+
+    def test_zero_retention_keeps_everything(self):
+        self.store.retention_seconds = 0
+        self.add("old-done", 10 ** 6, lambda job: self.store.complete(job, {"ok": True}))
+        self.assertEqual(self.store.prune_finished(), 0)
+        self.assertIsNotNone(self.store.get("old-done"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import array
+import os
+import random
+import unittest
+
+os.environ.setdefault("OPENAI_API_KEY", "test")  # services.openai_service builds its client at import
+
+from services.live_audit import CUT_SEARCH_SECONDS, quiet_cut
+
+
+def reference_cut(pcm: bytes, sample_rate: int) -> int:
+    # The original per-sample scan
+    search = min(len(pcm), int(CUT_SEARCH_SECONDS * sample_rate) * 2)
+    base = len(pcm) - search
+    samples = array.array("h")
+    samples.frombytes(pcm[base:])
+    step = max(1, sample_rate // 10)
+    best, best_energy = len(samples), None
+    for start in range(0, len(samples) - step + 1, step):
+        energy = sum(x * x for x in samples[start:start + step])
+        if best_energy is None or energy < best_energy:
+            best, best_energy = start + step // 2, energy
+    return base + best * 2
+
+
+class QuietCutTest(unittest.TestCase):
+    def test_cuts_in_the_pause(self):
+        rate = 8000
+        loud = array.array("h", [20000, -20000] * (rate // 2)).tobytes()  # 1 s
+        pause = bytes(rate // 5)  # 100 ms of silence
+        pcm = loud * 9 + pause + loud
+        cut = quiet_cut(pcm, rate)
+        self.assertGreaterEqual(cut, len(loud) * 9)
+        self.assertLessEqual(cut, len(loud) * 9 + len(pause))
+        self.assertEqual(cut % 2, 0)
+
+    def test_matches_per_sample_scan(self):
+        rng = random.Random(7)
+        for rate in (8000, 16000, 44100):
+            for seconds in (0.05, 1.3, 10):
+                samples = array.array("h", (rng.randint(-32768, 32767) for _ in range(int(rate * seconds))))
+                pcm = samples.tobytes()
+                self.assertEqual(quiet_cut(pcm, rate), reference_cut(pcm, rate), (rate, seconds))
+
+    def test_full_scale_energy_does_not_overflow(self):
+        rate = 48000
+        pcm = array.array("h", [-32768] * rate * 2).tobytes()
+        self.assertEqual(quiet_cut(pcm, rate), reference_cut(pcm, rate))
+
+
+if __name__ == "__main__":
+    unittest.main()
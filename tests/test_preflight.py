@@ -0,0 +1,55 @@
+import functools
+import os
+import struct
+import tempfile
+import threading
+import unittest
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from services.preflight_service import AUDIO_EMPTY, AudioRejected, check_duration, preflight_audio, wav_seconds
+
+
+def wav_header(data_bytes: int, sample_rate: int = 8000) -> bytes:
+    fmt = struct.pack("<HHIIHH", 1, 1, sample_rate, sample_rate * 2, 2, 16)
+    return (b"RIFF" + struct.pack("<I", 36 + data_bytes) + b"WAVE"
+            + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+            + b"data" + struct.pack("<I", data_bytes))
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class EmptyAudioTest(unittest.TestCase):
+    def test_header_only_wav_has_zero_duration(self):
+        header = wav_header(0)
+        self.assertEqual(len(header), 44)
+        self.assertEqual(wav_seconds(header, len(header)), 0.0)
+        self.assertEqual(wav_seconds(wav_header(16000) + b"\0" * 16000, 44 + 16000), 1.0)
+
+    def test_zero_duration_is_rejected_as_empty(self):
+        for seconds in (0.0, -1.0):
+            with self.assertRaises(AudioRejected) as rejected:
+                check_duration(seconds)
+            self.assertEqual(rejected.exception.code, AUDIO_EMPTY)
+        check_duration(None)  # unknown duration is not a reason to reject
+        check_duration(12.5)
+
+    def test_preflight_rejects_header_only_wav(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "empty.wav"), "wb") as f:
+                f.write(wav_header(0))
+            server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_QuietHandler, directory=directory))
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            try:
+                with self.assertRaises(AudioRejected) as rejected:
+                    preflight_audio(f"http://127.0.0.1:{server.server_port}/empty.wav")
+            finally:
+                server.shutdown()
+                server.server_close()
+        self.assertEqual(rejected.exception.code, AUDIO_EMPTY)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import time
+import unittest
+
+os.environ.setdefault("OPENAI_API_KEY", "test")  # services.openai_service builds its client at import
+
+from dtos.audit_models import RuleItem, RuleMatcher
+from services import rule_engine
+from services.rule_engine import split_local_rules
+
+# A transcript-sized call: long runs of the same letters are where backtracking patterns blow up
+SEGMENTS = [{"start": float(i), "text": "a" * 40 + " aaaa"} for i in range(2000)]
+
+
+def regex_rule(pattern: str) -> RuleItem:
+    return RuleItem(ruleId=1, rule="regex rule", matcher=RuleMatcher(type="regex", patterns=[pattern]))
+
+
+class RegexTimeoutTest(unittest.TestCase):
+    def test_catastrophic_patterns_fall_back_to_the_llm(self):
+        for pattern in ["(a|aa)+$", "(.*a){12}x", ".*.*.*.*x", "(a+)+$", "(.*a){8}x"]:
+            with self.subTest(pattern=pattern):
+                started = time.perf_counter()
+                local, remaining = split_local_rules(SEGMENTS, [regex_rule(pattern)])
+                elapsed = time.perf_counter() - started
+                self.assertLess(elapsed, rule_engine.MATCHER_REGEX_TIMEOUT_SECONDS + 2.0)
+                # Either it finished in time with a verdict, or it was stopped and left for the LLM
+                self.assertEqual(len(local) + len(remaining), 1)
+
+    def test_timed_out_pattern_is_left_for_the_llm(self):
+        local, remaining = split_local_rules(SEGMENTS, [regex_rule("(a|aa)+$")])
+        self.assertEqual(local, {})
+        self.assertEqual(len(remaining), 1)
+
+    def test_overlong_pattern_is_left_for_the_llm(self):
+        local, remaining = split_local_rules(SEGMENTS, [regex_rule("a" * (rule_engine.MATCHER_MAX_PATTERN_CHARS + 1))])
+        self.assertEqual((local, len(remaining)), ({}, 1))
+
+    def test_ordinary_pattern_matches(self):
+        local, _ = split_local_rules([{"start": 3.0, "text": "Thank you for calling"}], [regex_rule(r"thank you( for calling)?")])
+        self.assertEqual(local[0]["result"], "Yes")
+
+    def test_empty_match_on_empty_transcript(self):
+        local, _ = split_local_rules([], [regex_rule("x*")])
+        self.assertEqual(local[0]["result"], "Yes")
+
+
+if __name__ == "__main__":
+    unittest.main()
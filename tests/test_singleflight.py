@@ -0,0 +1,108 @@
+import asyncio
+import unittest
+
+from services.cancellation import DEADLINE_EXCEEDED, AuditCancelled, charge_stage, charge_tokens, check_cancelled, run_guarded
+from services.metrics_service import WASTED_STAGE_SECONDS, WASTED_TOKENS
+from services.singleflight import SingleFlight
+
+
+class SingleFlightDeadlineTest(unittest.IsolatedAsyncioTestCase):
+    async def test_follower_outlives_leader_deadline(self):
+        flight = SingleFlight("test")
+        runs = []
+
+        async def work():
+            await asyncio.sleep(0.3)
+            check_cancelled()  # would raise if the task carried the leader's deadline
+            runs.append("done")
+            return "result"
+
+        leader = asyncio.ensure_future(run_guarded("leader", lambda: flight.do("key", work), timeout=0.1))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(run_guarded("follower", lambda: flight.do("key", work)))
+
+        with self.assertRaises(AuditCancelled) as leader_error:
+            await leader
+        self.assertEqual(leader_error.exception.reason, DEADLINE_EXCEEDED)
+        self.assertEqual(await follower, "result")
+        self.assertEqual(runs, ["done"])
+
+    async def test_follower_deadline_applies_to_its_wait_only(self):
+        flight = SingleFlight("test")
+
+        async def work():
+            await asyncio.sleep(0.3)
+            return "result"
+
+        leader = asyncio.ensure_future(run_guarded("leader", lambda: flight.do("key", work)))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(run_guarded("follower", lambda: flight.do("key", work), timeout=0.1))
+
+        with self.assertRaises(AuditCancelled):
+            await follower
+        self.assertEqual(await leader, "result")
+
+    async def test_work_cancelled_when_every_caller_gives_up(self):
+        flight = SingleFlight("test")
+        cancelled = asyncio.Event()
+
+        async def work():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        callers = [asyncio.ensure_future(flight.do("key", work)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        callers[0].cancel()
+        await asyncio.sleep(0.01)
+        self.assertFalse(cancelled.is_set())
+        callers[1].cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.sleep(0)  # done callbacks run on the next loop iteration
+        self.assertEqual(flight.inflight(), 0)
+
+
+
+class SingleFlightUsageTest(unittest.IsolatedAsyncioTestCase):
+    async def test_cancelled_audit_is_charged_for_shared_work(self):
+        flight = SingleFlight("test")
+        wasted_tokens = WASTED_TOKENS.value(kind="prompt", reason=DEADLINE_EXCEEDED)
+        wasted_seconds = WASTED_STAGE_SECONDS.value(stage="transcribe", reason=DEADLINE_EXCEEDED)
+
+        async def work():
+            charge_tokens(100, 10)
+            charge_stage("transcribe", 2.0, 1.5)
+            await asyncio.sleep(10)
+
+        with self.assertRaises(AuditCancelled):
+            await run_guarded("audit", lambda: flight.do("key", work), timeout=0.1)
+        await asyncio.sleep(0.05)  # the cancelled flight settles its ledger in a done callback
+
+        self.assertEqual(WASTED_TOKENS.value(kind="prompt", reason=DEADLINE_EXCEEDED) - wasted_tokens, 100)
+        self.assertAlmostEqual(WASTED_STAGE_SECONDS.value(stage="transcribe", reason=DEADLINE_EXCEEDED) - wasted_seconds, 2.0)
+
+    async def test_shared_work_is_split_across_callers(self):
+        flight = SingleFlight("test")
+        wasted_tokens = WASTED_TOKENS.value(kind="prompt", reason=DEADLINE_EXCEEDED)
+
+        async def work():
+            charge_tokens(100, 10)
+            await asyncio.sleep(0.3)
+            return "result"
+
+        leader = asyncio.ensure_future(run_guarded("leader", lambda: flight.do("key", work), timeout=0.1))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(run_guarded("follower", lambda: flight.do("key", work)))
+
+        with self.assertRaises(AuditCancelled):
+            await leader
+        self.assertEqual(await follower, "result")
+        await asyncio.sleep(0)
+        # Only the cancelled leader's half was wasted; the follower used its half
+        self.assertEqual(WASTED_TOKENS.value(kind="prompt", reason=DEADLINE_EXCEEDED) - wasted_tokens, 50)
+
+
+if __name__ == "__main__":
+    unittest.main()